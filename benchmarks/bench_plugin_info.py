@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""Benchmark lv2-plugin-info extraction on synthetic LV2 bundles.
+
+Generates bundles with benchmarks/synth_bundles.py in a temporary directory,
+which is used as the only LV2_PATH entry, and times loading the bundles, the
+extraction stages of each plugin (load_resource, ports, presets, properties)
+and complete get_plugins_info() runs, with and without the persistent cache.
+
+The results are printed as JSON, so they can be compared across commits.
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from os.path import abspath, dirname, join
+
+HERE = dirname(abspath(__file__))
+sys.path.insert(0, join(HERE, '..', 'lv2'))
+
+import plugin_info  # noqa: E402
+from synth_bundles import add_arguments, generate_bundles  # noqa: E402
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _peak_rss_kib(who=resource.RUSAGE_SELF):
+    rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _timed(func, *args, **kw):
+    start = time.perf_counter()
+    result = func(*args, **kw)
+    return time.perf_counter() - start, result
+
+
+def bench_stages(num_plugins):
+    """Return dict of total seconds spent per extraction stage for all plugins."""
+    stages = dict.fromkeys(('load_all', 'load_resource', 'ports', 'presets', 'properties'), 0.0)
+    stages['load_all'], ctx = _timed(plugin_info._create_context)
+
+    for plugin in ctx.world.get_all_plugins():
+        ctx.errors = []
+        ctx.warnings = []
+        uri = plugin.get_uri()
+        stages['load_resource'] += _timed(ctx.world.load_resource, uri)[0]
+        stages['ports'] += _timed(plugin_info._get_plugin_ports, ctx, plugin)[0]
+        stages['presets'] += _timed(plugin_info._get_plugin_presets, ctx, plugin)[0]
+        stages['properties'] += _timed(plugin_info._get_plugin_properties, ctx, uri)[0]
+
+    return {stage: {'seconds': secs, 'plugins_per_second': num_plugins / secs if secs else None}
+            for stage, secs in stages.items()}
+
+
+def bench_runs(num_plugins, jobs, cache_file):
+    """Return dict with timings of complete and single plugin get_plugins_info() runs."""
+    runs = {}
+
+    for name, kw in (('full', {'jobs': jobs}),
+                     ('cache_cold', {'jobs': jobs, 'cache': True, 'cache_file': cache_file}),
+                     ('cache_warm', {'jobs': jobs, 'cache': True, 'cache_file': cache_file})):
+        secs, result = _timed(plugin_info.get_plugins_info, **kw)
+
+        if len(result) != num_plugins:
+            raise RuntimeError("%s run returned %i plugins instead of %i." %
+                               (name, len(result), num_plugins))
+
+        runs[name] = {'seconds': secs, 'plugins_per_second': num_plugins / secs}
+
+        if name == 'full':
+            full = result[0]
+
+    # a single plugin query only loads the bundles of the plugin and the shared
+    # bundles, but must give the same result (the first query builds the index)
+    plugin_info.get_plugins_info(full['uri'])
+    secs, result = _timed(plugin_info.get_plugins_info, full['uri'])
+
+    if result != full:
+        raise RuntimeError("Single plugin query for %s differs from full run." % full['uri'])
+
+    runs['single'] = {'seconds': secs}
+    return runs
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(ap)
+    ap.add_argument(
+        '-j', '--jobs',
+        type=int,
+        metavar='N',
+        default=1,
+        help="Number of worker processes for get_plugins_info() runs (default: %(default)s)")
+    ap.add_argument(
+        '-k', '--keep',
+        action="store_true",
+        help="Do not remove the generated bundles and print their location to stderr")
+
+    args = ap.parse_args(args)
+    tmpdir = tempfile.mkdtemp(prefix='lv2-bench-')
+    lv2_dir = join(tmpdir, 'lv2')
+
+    try:
+        gen_secs, _ = _timed(generate_bundles, lv2_dir, args.plugins, args.control_ports,
+                             args.scale_points, args.presets, args.properties)
+        # lilv and the cache read LV2_PATH when the world is loaded
+        os.environ['LV2_PATH'] = lv2_dir
+        os.environ['XDG_CACHE_HOME'] = join(tmpdir, 'cache')
+
+        result = {
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'parameters': {
+                'plugins': args.plugins,
+                'control_ports': args.control_ports,
+                'scale_points': args.scale_points,
+                'presets': args.presets,
+                'properties': args.properties,
+                'jobs': args.jobs,
+            },
+            'generate_seconds': gen_secs,
+            'stages': bench_stages(args.plugins),
+            'runs': bench_runs(args.plugins, args.jobs, join(tmpdir, 'cache', 'bench.json')),
+            'peak_rss_kib': _peak_rss_kib(),
+            'peak_rss_children_kib': _peak_rss_kib(resource.RUSAGE_CHILDREN),
+        }
+    finally:
+        if args.keep:
+            print("Bundles kept in %s" % lv2_dir, file=sys.stderr)
+        else:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    json.dump(result, sys.stdout, indent=2, sort_keys=True)
+    print()
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
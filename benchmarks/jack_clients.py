@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""Benchmark the per-call latency of the jack_tools functions with and without a client pool.
+
+Runs each operation repeatedly in three modes and prints the mean and median
+time per call in milliseconds as JSON:
+
+* 'script': run the command line script in a new Python process, as a shell
+  script calling it would
+* 'client': call the function in-process, registering a new JACK client for
+  each call (as every function did before pool.py was added)
+* 'pooled': call the function in-process within a ClientPool, so the JACK
+  client is only registered once
+
+Requires a running JACK server.
+
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from os.path import abspath, dirname, join
+
+JACK_TOOLS = join(dirname(abspath(__file__)), '..', 'jack_tools')
+sys.path.insert(0, JACK_TOOLS)
+
+from client import get_port_info, get_status  # noqa: E402
+from pool import ClientPool  # noqa: E402
+from port_tools import snapshot_connections  # noqa: E402
+from transporter import query_transport  # noqa: E402
+
+
+# name: (function, script command line)
+OPERATIONS = {
+    'status': (get_status, ['client.py', 'query']),
+    'port-info': (get_port_info, ['client.py', 'port-info']),
+    'transport': (query_transport, ['transporter.py', 'query']),
+    'connections': (snapshot_connections, ['port_tools.py', 'snapshot']),
+}
+
+
+def time_calls(func, rounds):
+    """Return list of the wall time of each of rounds calls of func in milliseconds."""
+    timings = []
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+
+def summarize(timings):
+    return {'mean': statistics.mean(timings), 'median': statistics.median(timings)}
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument(
+        '-n', '--rounds',
+        type=int,
+        default=50,
+        help="Number of calls per operation and mode (default: %(default)s)")
+    ap.add_argument(
+        '--no-script',
+        action="store_true",
+        help="Do not benchmark running the command line scripts")
+    ap.add_argument(
+        'operations',
+        nargs='*',
+        metavar='OPERATION',
+        help="Operations to benchmark (%s, default: all)" % ", ".join(sorted(OPERATIONS)))
+
+    args = ap.parse_args(args)
+    results = {}
+
+    for name in args.operations:
+        if name not in OPERATIONS:
+            return "error: unknown operation '%s'." % name
+
+    try:
+        for name in args.operations or sorted(OPERATIONS):
+            func, command = OPERATIONS[name]
+            result = results[name] = {}
+
+            if not args.no_script:
+                command = [sys.executable, join(JACK_TOOLS, command[0])] + command[1:]
+                result['script'] = summarize(time_calls(
+                    lambda: subprocess.run(command, check=True, stdout=subprocess.DEVNULL),
+                    args.rounds))
+
+            result['client'] = summarize(time_calls(func, args.rounds))
+
+            with ClientPool():
+                # the first call registers the pooled client
+                func()
+                result['pooled'] = summarize(time_calls(func, args.rounds))
+    except (ConnectionError, subprocess.CalledProcessError) as exc:
+        return "error: %s" % exc
+
+    json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    print()
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
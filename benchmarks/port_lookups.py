@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""Micro-benchmark of the predicate lookups done for each port by lv2-plugin-info.
+
+Compares resolving the predicate nodes through 'world.ns' attribute lookups
+and splitting every type URI (as done before the interned node table was
+introduced) with using the interned node table and fragment memo, and
+reports the time per port for both and for the complete port extraction.
+
+Run on the installed plugin with the given URI or, by default, on the plugin
+with the most ports.
+
+"""
+
+import argparse
+import json
+import sys
+import time
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'lv2'))
+
+import lilv  # noqa: E402
+
+import plugin_info  # noqa: E402
+
+
+def lookups_namespace(ns, mod, pprops, units, port):
+    port.get_value(ns.lv2.shortName)
+    port.get_value(ns.lv2.shortname)
+    [str(t).rsplit("#", 1)[-1][:-4] for t in port.get_value(ns.rdf.type)]
+    port.get_value(ns.atom.bufferType)
+    port.supports_event(ns.midi.MidiEvent)
+    port.get_value(ns.rdfs.comment)
+    port.get_value(ns.lv2.designation)
+    port.get_value(mod.rangeSteps)
+    port.get_value(pprops.rangeSteps)
+    [str(t).rsplit("#", 1)[-1] for t in port.get_value(ns.lv2.portProperty)]
+    port.get_value(units.unit)
+
+
+def lookups_interned(ctx, port):
+    nodes = ctx.nodes
+    port.get_value(nodes.lv2_shortName)
+    port.get_value(nodes.lv2_shortname)
+    [plugin_info._fragment(ctx, t)[:-4] for t in port.get_value(nodes.rdf_type)]
+    port.get_value(nodes.atom_bufferType)
+    port.supports_event(nodes.midi_MidiEvent)
+    port.get_value(nodes.rdfs_comment)
+    port.get_value(nodes.lv2_designation)
+    port.get_value(nodes.mod_rangeSteps)
+    port.get_value(nodes.pprops_rangeSteps)
+    [plugin_info._fragment(ctx, t) for t in port.get_value(nodes.lv2_portProperty)]
+    port.get_value(nodes.units_unit)
+
+
+def per_port(func, ports, rounds):
+    start = time.perf_counter()
+
+    for _ in range(rounds):
+        for port in ports:
+            func(port)
+
+    return (time.perf_counter() - start) / (rounds * len(ports)) * 1e6
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument(
+        '-n', '--rounds',
+        type=int,
+        default=20,
+        help="Number of times to process all ports (default: %(default)s)")
+    ap.add_argument(
+        'plugin_uri',
+        nargs='?',
+        metavar='URI', help='Plugin URI')
+
+    args = ap.parse_args(args)
+    ctx = plugin_info._create_context()
+    plugins = ctx.world.get_all_plugins()
+
+    if args.plugin_uri:
+        plugin = plugins[ctx.world.new_uri(args.plugin_uri)]
+    elif len(plugins):
+        plugin = max(plugins, key=lambda p: p.get_num_ports())
+    else:
+        return "error: no LV2 plugins found."
+
+    ctx.world.load_resource(plugin.get_uri())
+    ctx.errors = []
+    ctx.warnings = []
+    ports = [plugin.get_port_by_index(i) for i in range(plugin.get_num_ports())]
+
+    if not ports:
+        return "error: plugin has no ports."
+
+    # namespaces were created once per plugin, their attributes resolved per port
+    world = ctx.world
+    mod = lilv.Namespace(world, plugin_info.NS_MOD)
+    pprops = lilv.Namespace(world, plugin_info.NS_PORT_PROPERTIES)
+    units = lilv.Namespace(world, plugin_info.NS_UNITS)
+    namespace = per_port(lambda port: lookups_namespace(world.ns, mod, pprops, units, port),
+                         ports, args.rounds)
+    interned = per_port(lambda port: lookups_interned(ctx, port), ports, args.rounds)
+    start = time.perf_counter()
+
+    for _ in range(args.rounds):
+        plugin_info._get_plugin_ports(ctx, plugin)
+
+    extract = (time.perf_counter() - start) / (args.rounds * len(ports)) * 1e6
+
+    json.dump({
+        'plugin': str(plugin.get_uri()),
+        'ports': len(ports),
+        'rounds': args.rounds,
+        'lookups_namespace_us_per_port': namespace,
+        'lookups_interned_us_per_port': interned,
+        'saved_us_per_port': namespace - interned,
+        'get_plugin_ports_us_per_port': extract,
+    }, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
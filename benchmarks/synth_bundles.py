@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""Generate synthetic LV2 bundles for benchmarking the lv2 scripts.
+
+Each bundle contains only Turtle files (manifest, plugin description and
+presets) for one plugin with a configurable number of control ports, scale
+points, presets and patch properties. No plugin binaries are generated.
+
+"""
+
+import argparse
+import os
+import sys
+from os.path import join
+
+
+PREFIXES = """\
+@prefix atom: <http://lv2plug.in/ns/ext/atom#> .
+@prefix doap: <http://usefulinc.com/ns/doap#> .
+@prefix foaf: <http://xmlns.com/foaf/0.1/> .
+@prefix lv2: <http://lv2plug.in/ns/lv2core#> .
+@prefix mod: <http://moddevices.com/ns/mod#> .
+@prefix patch: <http://lv2plug.in/ns/ext/patch#> .
+@prefix pset: <http://lv2plug.in/ns/ext/presets#> .
+@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix units: <http://lv2plug.in/ns/extensions/units#> .
+
+"""
+
+URI_TEMPLATE = "urn:calvo-cli-tools:synth:%05i"
+
+
+def _manifest(uri, presets):
+    lines = [
+        PREFIXES,
+        "<%s> a lv2:Plugin ;\n    lv2:binary <synth.so> ;\n    rdfs:seeAlso <plugin.ttl> .\n" % uri,
+    ]
+
+    for i in range(presets):
+        lines.append("\n<%s#preset%i> a pset:Preset ;\n    lv2:appliesTo <%s> ;\n"
+                     "    rdfs:seeAlso <presets.ttl> .\n" % (uri, i, uri))
+
+    return ''.join(lines)
+
+
+def _control_port(index, scale_points):
+    lines = [
+        "[\n        a lv2:InputPort, lv2:ControlPort ;",
+        "        lv2:index %i ;" % index,
+        '        lv2:symbol "ctl%i" ;' % index,
+        '        lv2:name "Control %i" ;' % index,
+        "        lv2:default 0.5 ;",
+        "        lv2:minimum 0.0 ;",
+        "        lv2:maximum %i.0 ;" % max(1, scale_points),
+        "        units:unit units:db",
+    ]
+
+    for i in range(scale_points):
+        lines[-1] += " ;"
+        lines.append('        lv2:scalePoint [ rdfs:label "Point %i" ; rdf:value %i.0 ]' % (i, i))
+
+    lines.append("    ]")
+    return '\n'.join(lines)
+
+
+def _plugin(uri, num, control_ports, scale_points, properties):
+    ports = [
+        '[\n        a lv2:InputPort, lv2:AudioPort ;\n        lv2:index 0 ;\n'
+        '        lv2:symbol "in" ;\n        lv2:name "In"\n    ]',
+        '[\n        a lv2:OutputPort, lv2:AudioPort ;\n        lv2:index 1 ;\n'
+        '        lv2:symbol "out" ;\n        lv2:name "Out"\n    ]',
+    ]
+    ports.extend(_control_port(i + 2, scale_points) for i in range(control_ports))
+    lines = [
+        PREFIXES,
+        "<%s> a lv2:Plugin, lv2:ReverbPlugin ;" % uri,
+        '    doap:name "Synthetic Plugin %i" ;' % num,
+        "    doap:license <http://opensource.org/licenses/isc> ;",
+        '    doap:maintainer [ foaf:name "calvo-cli-tools" ] ;',
+        '    rdfs:comment "Synthetic plugin for benchmarks." ;',
+        "    lv2:minorVersion 2 ;",
+        "    lv2:microVersion 0 ;",
+        '    mod:brand "Synthetic" ;',
+        '    mod:label "Synth %i" ;' % num,
+    ]
+
+    for i in range(properties):
+        lines.append("    patch:writable <%s#property%i> ;" % (uri, i))
+
+    lines.append("    lv2:port %s .\n" % ", ".join(ports))
+
+    for i in range(properties):
+        lines.append('<%s#property%i> a lv2:Parameter ;\n    rdfs:label "Property %i" ;\n'
+                     '    rdfs:range atom:Path .\n' % (uri, i, i))
+
+    return '\n'.join(lines)
+
+
+def _presets(uri, presets, control_ports):
+    lines = [PREFIXES]
+
+    for i in range(presets):
+        values = ", ".join('[ lv2:symbol "ctl%i" ; pset:value %i.5 ]' % (p + 2, i % 2)
+                           for p in range(control_ports))
+        lines.append('<%s#preset%i> a pset:Preset ;\n    lv2:appliesTo <%s> ;\n'
+                     '    rdfs:label "Preset %i"%s .\n' %
+                     (uri, i, uri, i, " ;\n    lv2:port %s" % values if values else ""))
+
+    return '\n'.join(lines)
+
+
+def generate_bundles(directory, plugins=100, control_ports=16, scale_points=0, presets=4,
+                     properties=0):
+    """Write synthetic plugin bundles into directory and return list of plugin URIs."""
+    uris = []
+
+    for num in range(plugins):
+        uri = URI_TEMPLATE % num
+        bundle = join(directory, "synth%05i.lv2" % num)
+        os.makedirs(bundle, exist_ok=True)
+        files = {
+            'manifest.ttl': _manifest(uri, presets),
+            'plugin.ttl': _plugin(uri, num, control_ports, scale_points, properties),
+            'presets.ttl': _presets(uri, presets, control_ports),
+        }
+
+        for name, content in files.items():
+            with open(join(bundle, name), 'w', encoding='utf-8') as fp:
+                fp.write(content)
+
+        uris.append(uri)
+
+    return uris
+
+
+def add_arguments(ap):
+    """Add the bundle generator options to an argparse.ArgumentParser."""
+    ap.add_argument(
+        '-n', '--plugins',
+        type=int,
+        metavar='NUM',
+        default=100,
+        help="Number of plugin bundles (default: %(default)s)")
+    ap.add_argument(
+        '--control-ports',
+        type=int,
+        metavar='NUM',
+        default=16,
+        help="Number of control input ports per plugin (default: %(default)s)")
+    ap.add_argument(
+        '--scale-points',
+        type=int,
+        metavar='NUM',
+        default=0,
+        help="Number of scale points per control port (default: %(default)s)")
+    ap.add_argument(
+        '--presets',
+        type=int,
+        metavar='NUM',
+        default=4,
+        help="Number of presets per plugin (default: %(default)s)")
+    ap.add_argument(
+        '--properties',
+        type=int,
+        metavar='NUM',
+        default=0,
+        help="Number of patch properties per plugin (default: %(default)s)")
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    add_arguments(ap)
+    ap.add_argument('directory', help="Output directory, e.g. a directory in LV2_PATH")
+    args = ap.parse_args(args)
+    generate_bundles(args.directory, args.plugins, args.control_ports, args.scale_points,
+                     args.presets, args.properties)
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
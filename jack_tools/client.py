@@ -8,7 +8,70 @@ import argparse
 import string
 import sys
 import json
-import jack
+
+if __package__:
+    from .control_client import DaemonError, DaemonUnavailable, call
+    from .pool import create_client, open_client
+else:
+    # run as a script
+    from control_client import DaemonError, DaemonUnavailable, call
+    from pool import create_client, open_client
+
+
+def get_status(client_name='jack_client', client=None):
+    """Return dict with the JACK server status.
+
+    client is used instead of acquiring one with pool.open_client.
+    """
+    with open_client(client_name, client) as client:
+        return {
+            "status": "running",
+            "cpu_load": client.cpu_load(),
+            "block_size": client.blocksize,
+            "realtime": client.realtime,
+            "sample_rate": client.samplerate,
+        }
+
+
+def get_port_info(client_name='jack_client', client=None):
+    """Return dict with the names of all JACK ports, grouped by type and direction.
+
+    client is used instead of acquiring one with pool.open_client.
+    """
+    res = {
+        'all': [],
+        'audio': {
+            'playback': [],
+            'capture': [],
+        },
+        'midi': {
+            'playback': [],
+            'capture': [],
+        },
+        # 'terminal': {
+        #     'playback': [],
+        #     'capture': [],
+        # }
+    }
+
+    with open_client(client_name, client) as client:
+        all_ports = client.get_ports('')
+
+        for port in all_ports:
+            res['all'].append(port.name)
+            p_direction = "playback" if port.is_input else 'capture'
+
+            p_type = ""
+            if port.is_audio:
+                p_type = "audio"
+            elif port.is_midi:
+                p_type = "midi"
+            # elif port.is_terminal:
+            #     p_type = "terminal"
+            res[p_type][p_direction].append(port.name)
+            # print(port.name)
+
+    return res
 
 
 def main(args=None):
@@ -27,10 +90,20 @@ def main(args=None):
 
     args = ap.parse_args(args)
 
+    # forward to the control daemon, if it is running
     try:
-        client = jack.Client(args.client_name)
-    except jack.JackError as exc:
-        return "Could not create JACK client: {}".format(exc)
+        json.dump(call(args.command.replace('-', '_')), sys.stdout, indent=2)
+    except DaemonError as exc:
+        return "error: {}".format(exc)
+    except DaemonUnavailable:
+        pass
+    else:
+        return 0
+
+    try:
+        client = create_client(args.client_name)
+    except ConnectionError as exc:
+        return str(exc)
 
     result = 0
     if args.command == 'check':
@@ -38,47 +111,10 @@ def main(args=None):
         print("running")
         result = 0
     if args.command == 'query':
-        res = {
-            "status": "running",
-            "cpu_load": client.cpu_load(),
-            "block_size": client.blocksize,
-            "realtime": client.realtime,
-            "sample_rate": client.samplerate,
-        }
-        json.dump(res, sys.stdout, indent=2)
+        json.dump(get_status(client=client), sys.stdout, indent=2)
         result = 0
     if args.command == 'port-info':
-        all_ports = client.get_ports('')
-        res = {
-            'all': [],
-            'audio': {
-                'playback': [],
-                'capture': [],
-            },
-            'midi': {
-                'playback': [],
-                'capture': [],
-            },
-            # 'terminal': {
-            #     'playback': [],
-            #     'capture': [],
-            # }
-        }
-        for port in all_ports:
-            res['all'].append(port.name)
-            p_direction = "playback" if port.is_input else 'capture'
-
-            p_type = ""
-            if port.is_audio:
-                p_type = "audio"
-            elif port.is_midi:
-                p_type = "midi"
-            # elif port.is_terminal:
-            #     p_type = "terminal"
-            res[p_type][p_direction].append(port.name)
-            # print(port.name)
-
-        json.dump(res, sys.stdout, indent=2)
+        json.dump(get_port_info(client=client), sys.stdout, indent=2)
     client.close()
     return result
 
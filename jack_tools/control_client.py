@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""Send commands to a running JACK control daemon (see control_daemon.py).
+
+Requests and responses are JSON-RPC 2.0 objects, each on a separate line,
+sent over a Unix domain socket. Subscribed connections also receive change
+events as JSON-RPC notifications with method "event". This module does not
+use jack, so the command line scripts can forward commands to the daemon
+without registering a JACK client.
+
+The socket path can be set with the JACK_CONTROL_SOCKET environment variable.
+Setting it to an empty string disables the use of the daemon. The directory
+of the socket must be owned by the current user and not be accessible by
+anybody else, otherwise the daemon is not used.
+
+"""
+
+import json
+import os
+import socket
+import stat
+import tempfile
+from os.path import dirname, exists, join
+
+
+SOCKET_ENV = 'JACK_CONTROL_SOCKET'
+
+
+class DaemonUnavailable(Exception):
+    """Raised when no control daemon is listening on the socket."""
+
+
+class DaemonError(Exception):
+    """Raised when the control daemon returns an error for a request."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def get_socket_path():
+    """Return path of the control daemon socket or None if its use is disabled."""
+    path = os.environ.get(SOCKET_ENV)
+
+    if path is not None:
+        return path or None
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+
+    if runtime_dir:
+        return join(runtime_dir, 'calvo-cli-tools', 'jack-control.sock')
+
+    return join(tempfile.gettempdir(), 'calvo-cli-tools-%i' % os.getuid(), 'jack-control.sock')
+
+
+def check_socket_dir(socket_path):
+    """Raise PermissionError unless the directory of socket_path is private.
+
+    It must be a directory (not a symbolic link) owned by the current user,
+    which only the user can access, so that no other user can put a socket
+    there, which would receive the requests.
+
+    """
+    directory = dirname(socket_path) or '.'
+    st = os.lstat(directory)
+
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError("Socket directory '%s' must be owned by the current user and "
+                              "have mode 0700." % directory)
+
+
+def _connect(socket_path):
+    socket_path = socket_path or get_socket_path()
+
+    if not socket_path or not exists(socket_path):
+        raise DaemonUnavailable("No control daemon socket found.")
+
+    try:
+        check_socket_dir(socket_path)
+    except OSError as exc:
+        raise DaemonUnavailable("Not using control daemon: %s" % exc)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(socket_path)
+    except OSError as exc:
+        sock.close()
+        raise DaemonUnavailable("Could not connect to control daemon: %s" % exc)
+
+    return sock
+
+
+def _request(sock, fp, method, params):
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params or {}}
+
+    try:
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        line = fp.readline()
+    except OSError as exc:
+        raise DaemonUnavailable("Control daemon connection failed: %s" % exc)
+
+    if not line:
+        raise DaemonUnavailable("Control daemon closed the connection.")
+
+    response = json.loads(line)
+
+    if 'error' in response:
+        raise DaemonError(response['error'].get('message'), response['error'].get('code'))
+
+    return response['result']
+
+
+def call(method, params=None, socket_path=None):
+    """Send a request to the control daemon and return the result.
+
+    Raises DaemonUnavailable if the daemon is not running and DaemonError if
+    the request failed.
+
+    """
+    sock = _connect(socket_path)
+
+    with sock, sock.makefile('rb') as fp:
+        return _request(sock, fp, method, params)
+
+
+def subscribe(socket_path=None):
+    """Subscribe to the port and connection changes seen by the control daemon.
+
+    Generator, which first yields the daemon's registry snapshot (see
+    port_monitor.PortRegistry.snapshot) and then each change event dict as it
+    is received. Returns when the daemon closes the connection.
+
+    Raises DaemonUnavailable if the daemon is not running and DaemonError if
+    the request failed.
+
+    """
+    sock = _connect(socket_path)
+
+    with sock, sock.makefile('rb') as fp:
+        yield _request(sock, fp, 'subscribe', None)
+
+        for line in fp:
+            message = json.loads(line)
+
+            if message.get('method') == 'event':
+                yield message['params']
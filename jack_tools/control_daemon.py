@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+"""Run JACK commands through one resident client over a Unix domain socket.
+
+The daemon registers a single JACK client on start-up and runs all commands
+through it, so commands neither pay for registering a client nor leave
+short-lived clients in the JACK graph.
+
+Clients send JSON-RPC 2.0 requests, one per line, and receive one response
+line per request (see control_client.py). Supported methods:
+
+* ping() - return process ID and JACK client name
+* query() - see client.py
+* port_info() - see client.py
+* list_ports(pattern='', is_audio=False, ...) - see list_ports.py
+* ports() - all clients, ports and connections (see port_monitor.py)
+* subscribe() - same as ports(), then send each change as an "event" notification
+* connect(source, destination) - see port_tools.py
+* disconnect(source, destination, quiet=False) - see port_tools.py
+* clear(port) - see port_tools.py
+* apply(connections, exclusive=False, dry_run=False) - see port_tools.py
+* snapshot() - see port_tools.py
+* restore(connections, dry_run=False) - see port_tools.py
+* transport(command='status') - see transporter.py
+
+The ports and connections are kept in a registry, which is updated from JACK
+callbacks (see port_monitor.py), so 'port_info', 'list_ports' and 'ports' do
+not enumerate the JACK ports. The command line scripts forward their commands
+to the daemon automatically if it is running. The daemon exits when the JACK server shuts down.
+
+"""
+
+import argparse
+import inspect
+import json
+import os
+import select
+import signal
+import socket
+import sys
+from os.path import dirname
+
+if __package__:
+    from .client import get_status
+    from .control_client import (DaemonError, DaemonUnavailable, call, check_socket_dir,
+                                  get_socket_path)
+    from .pool import create_client
+    from .port_monitor import PortMonitor
+    from .port_tools import (apply_connections, clear_port, connect_ports,
+                             restore_connections, snapshot_connections)
+    from .transporter import transport
+else:
+    # run as a script
+    from client import get_status
+    from control_client import (DaemonError, DaemonUnavailable, call, check_socket_dir,
+                                get_socket_path)
+    from pool import create_client
+    from port_monitor import PortMonitor
+    from port_tools import (apply_connections, clear_port, connect_ports, restore_connections,
+                            snapshot_connections)
+    from transporter import transport
+
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+COMMAND_ERROR = -32000
+
+# pending output in bytes, after which a client is disconnected
+MAX_OUTPUT = 16 * 1024 * 1024
+
+
+class ControlDaemon:
+    """Resident JACK client with JSON-RPC request dispatch."""
+
+    def __init__(self, client_name='jack-control'):
+        self.client = create_client(client_name)
+        self.shutdown = None
+        self.client.set_shutdown_callback(self._on_shutdown)
+        self.monitor = PortMonitor(self.client)
+        self.client.activate()
+        self.monitor.load()
+        self.subscribers = set()
+        self.connection = None
+        self.methods = {
+            'apply': self.apply,
+            'clear': self.clear,
+            'connect': self.connect,
+            'disconnect': self.disconnect,
+            'list_ports': self.list_ports,
+            'ping': self.ping,
+            'port_info': self.port_info,
+            'ports': self.ports,
+            'query': self.query,
+            'restore': self.restore,
+            'snapshot': self.snapshot,
+            'subscribe': self.subscribe,
+            'transport': self.transport,
+        }
+
+    def _on_shutdown(self, status, reason):
+        # called from a JACK thread, only record the reason
+        self.shutdown = reason
+        self.monitor.wake()
+
+    def close(self):
+        self.client.deactivate()
+        self.client.close()
+        self.monitor.close()
+
+    def update(self):
+        """Apply the queued port and connection changes and return the resulting events."""
+        return self.monitor.poll()
+
+    def ping(self):
+        return {'pid': os.getpid(), 'client': self.client.name}
+
+    def query(self):
+        return get_status(client=self.client)
+
+    def port_info(self):
+        return self.monitor.registry.port_info()
+
+    def list_ports(self, pattern='', is_audio=False, is_midi=False, is_input=False,
+                   is_output=False, is_physical=False, can_monitor=False, is_terminal=False):
+        return self.monitor.registry.get_port_names(pattern, is_audio, is_midi, is_input,
+                                                    is_output, is_physical, can_monitor,
+                                                    is_terminal)
+
+    def ports(self):
+        return self.monitor.registry.snapshot()
+
+    def subscribe(self):
+        if self.connection is None:
+            raise ValueError("Subscriptions require a connection.")
+
+        self.subscribers.add(self.connection)
+        return self.ports()
+
+    def connect(self, source, destination):
+        connect_ports(source, destination, None, client=self.client)
+
+    def disconnect(self, source, destination, quiet=False):
+        connect_ports(source, destination, None, True, quiet, client=self.client)
+
+    def clear(self, port):
+        clear_port(port, client=self.client)
+
+    def apply(self, connections, exclusive=False, dry_run=False):
+        connected, disconnected = apply_connections(connections, exclusive=exclusive,
+                                                    dry_run=dry_run, client=self.client)
+        return {'connected': connected, 'disconnected': disconnected}
+
+    def snapshot(self):
+        return snapshot_connections(client=self.client)
+
+    def restore(self, connections, dry_run=False):
+        connected, disconnected, missing = restore_connections(connections, dry_run=dry_run,
+                                                               client=self.client)
+        return {'connected': connected, 'disconnected': disconnected, 'missing': missing}
+
+    def transport(self, command='status'):
+        return transport(command, client=self.client)
+
+    def handle(self, line, connection=None):
+        """Return JSON-RPC response line for request line or None for notifications.
+
+        connection is the socket the request was received on, which is
+        subscribed to change events by the 'subscribe' method.
+
+        """
+        self.connection = connection
+
+        try:
+            request = json.loads(line)
+        except ValueError as exc:
+            return _error_response(None, PARSE_ERROR, "Parse error: %s" % exc)
+
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return _error_response(None, INVALID_REQUEST, "Invalid request")
+
+        req_id = request.get('id')
+        method = self.methods.get(request['method'])
+        params = request.get('params') or {}
+
+        if method is None:
+            response = _error_response(req_id, METHOD_NOT_FOUND,
+                                       "Method not found: %s" % request['method'])
+        else:
+            try:
+                if isinstance(params, dict):
+                    args = inspect.signature(method).bind(**params)
+                else:
+                    args = inspect.signature(method).bind(*params)
+            except TypeError as exc:
+                response = _error_response(req_id, INVALID_PARAMS, "Invalid params: %s" % exc)
+            else:
+                try:
+                    result = method(*args.args, **args.kwargs)
+                except Exception as exc:
+                    # a failing command must not bring down the daemon
+                    response = _error_response(req_id, COMMAND_ERROR, str(exc))
+                else:
+                    response = json.dumps({'jsonrpc': '2.0', 'id': req_id, 'result': result})
+
+        if 'id' in request:
+            return response
+
+
+def _error_response(req_id, code, message):
+    return json.dumps({'jsonrpc': '2.0', 'id': req_id,
+                       'error': {'code': code, 'message': message}})
+
+
+def serve(daemon, socket_path):
+    """Answer requests on a Unix domain socket.
+
+    Runs until interrupted or the JACK server shuts down. Returns the reason
+    given by the JACK server in the latter case.
+
+    Port and connection changes are sent to the subscribed connections before
+    any requests received at the same time are answered. The client sockets
+    are non-blocking and responses and events are buffered until they can be
+    sent, so a client which does not read them does not stall the daemon. It
+    is disconnected when more than MAX_OUTPUT bytes are pending.
+
+    """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+    clients = {}
+
+    try:
+        while daemon.shutdown is None:
+            pending = [sock for sock, client in clients.items() if client.output]
+            readable, writable, _ = select.select([server, daemon.monitor] + list(clients),
+                                                  pending, [])
+            _send_events(daemon, clients, daemon.update())
+
+            for sock in writable:
+                if sock in clients:
+                    _flush(daemon, clients, sock)
+
+            for sock in readable:
+                if sock is server:
+                    client, _ = server.accept()
+                    client.setblocking(False)
+                    clients[client] = _Client()
+                elif sock in clients:
+                    _read_requests(daemon, clients, sock)
+    finally:
+        for client in clients:
+            client.close()
+
+        server.close()
+        os.unlink(socket_path)
+
+    return daemon.shutdown
+
+
+class _Client:
+    """Input and output buffers of a client connection."""
+
+    def __init__(self):
+        self.input = b''
+        self.output = bytearray()
+
+
+def _read_requests(daemon, clients, sock):
+    try:
+        data = sock.recv(65536)
+    except BlockingIOError:
+        return
+    except OSError:
+        data = b''
+
+    if not data:
+        _close(daemon, clients, sock)
+        return
+
+    *lines, clients[sock].input = (clients[sock].input + data).split(b'\n')
+
+    for line in lines:
+        if not line.strip():
+            continue
+
+        response = daemon.handle(line, sock)
+
+        if response is not None:
+            _send(daemon, clients, sock, response.encode('utf-8') + b'\n')
+
+            if sock not in clients:
+                return
+
+
+def _send_events(daemon, clients, events):
+    if not events or not daemon.subscribers:
+        return
+
+    data = b''.join(json.dumps({'jsonrpc': '2.0', 'method': 'event', 'params': event},
+                               sort_keys=True).encode('utf-8') + b'\n'
+                    for event in events)
+
+    for sock in list(daemon.subscribers):
+        _send(daemon, clients, sock, data)
+
+
+def _send(daemon, clients, sock, data):
+    client = clients[sock]
+
+    if len(client.output) + len(data) > MAX_OUTPUT:
+        # the client does not read what it is sent
+        _close(daemon, clients, sock)
+        return
+
+    client.output += data
+    _flush(daemon, clients, sock)
+
+
+def _flush(daemon, clients, sock):
+    output = clients[sock].output
+
+    try:
+        del output[:sock.send(output)]
+    except BlockingIOError:
+        pass
+    except OSError:
+        _close(daemon, clients, sock)
+
+
+def _close(daemon, clients, sock):
+    sock.close()
+    del clients[sock]
+    daemon.subscribers.discard(sock)
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument(
+        '-c', '--client-name',
+        metavar='NAME',
+        default='jack-control',
+        help="JACK client name (default: %(default)s)")
+    ap.add_argument(
+        '-s', '--socket',
+        metavar='PATH',
+        help="Unix domain socket path (default: $JACK_CONTROL_SOCKET or "
+             "$XDG_RUNTIME_DIR/calvo-cli-tools/jack-control.sock)")
+
+    args = ap.parse_args(args)
+    socket_path = args.socket or get_socket_path()
+
+    if not socket_path:
+        return "error: no socket path given."
+
+    if dirname(socket_path):
+        os.makedirs(dirname(socket_path), mode=0o700, exist_ok=True)
+
+    try:
+        # an existing directory may have been created by another user
+        check_socket_dir(socket_path)
+    except OSError as exc:
+        return "error: %s" % exc
+
+    try:
+        call('ping', socket_path=socket_path)
+    except (DaemonUnavailable, DaemonError):
+        pass
+    else:
+        return "error: control daemon is already running on '%s'." % socket_path
+
+    if os.path.exists(socket_path):
+        # left over from a daemon which was not shut down cleanly
+        os.unlink(socket_path)
+
+    try:
+        daemon = ControlDaemon(args.client_name)
+    except ConnectionError as exc:
+        return "error: %s" % exc
+
+    # shut down cleanly and remove the socket on SIGTERM too
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+
+    try:
+        reason = serve(daemon, socket_path)
+    except KeyboardInterrupt:
+        reason = None
+    finally:
+        if daemon.shutdown is None:
+            daemon.close()
+
+    if reason is not None:
+        return "error: JACK server shut down: %s" % reason
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
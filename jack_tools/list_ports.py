@@ -6,26 +6,45 @@ import sys
 import json
 import jack
 
+if __package__:
+    from .control_client import DaemonError, DaemonUnavailable, call
+    from .pool import open_client
+else:
+    # run as a script
+    from control_client import DaemonError, DaemonUnavailable, call
+    from pool import open_client
 
-def list_jack_ports(pattern='', is_audio=False, is_midi=False, is_input=False, is_output=False, is_physical=False, can_monitor=False, is_terminal=False):
-    """list of Port/MidiPort/OwnPort/OwnMidiPort
-    All ports that satisfy the given conditions."""
-    try:
-        client = jack.Client(args.client_name)
-    except jack.JackError as exc:
-        return "Could not create JACK client: {}".format(exc)
 
-    try:
+def get_port_names(pattern='', is_audio=False, is_midi=False, is_input=False, is_output=False, is_physical=False, can_monitor=False, is_terminal=False, client_name='jack_client', client=None):
+    """Return list of the names of all ports that satisfy the given conditions.
+
+    client is used instead of acquiring one with pool.open_client."""
+    with open_client(client_name, client) as client:
         ports = client.get_ports(
             pattern, is_audio, is_midi, is_input, is_output, is_physical, can_monitor, is_terminal)
 
         port_names = []
         for port in ports:
             port_names.append(port.name)
-        json.dump(port_names, sys.stdout, indent=2)
+
+    return port_names
+
+
+def list_jack_ports(pattern='', is_audio=False, is_midi=False, is_input=False, is_output=False, is_physical=False, can_monitor=False, is_terminal=False, client_name='jack_client', client=None):
+    """list of Port/MidiPort/OwnPort/OwnMidiPort
+    All ports that satisfy the given conditions.
+
+    client is used instead of acquiring one with pool.open_client."""
+    try:
+        port_names = get_port_names(pattern, is_audio, is_midi, is_input, is_output, is_physical,
+                                    can_monitor, is_terminal, client_name, client)
+    except ConnectionError as exc:
+        return str(exc)
     except jack.JackError as exc:
         return "Error trying to get port: {}".format(exc)
 
+    json.dump(port_names, sys.stdout, indent=2)
+
 
 if __name__ == '__main__':
     ap = argparse.ArgumentParser(description=__doc__)
@@ -83,5 +102,17 @@ if __name__ == '__main__':
     )
 
     args = ap.parse_args()
-    sys.exit(list_jack_ports(pattern=args.pattern,
-                             is_audio=args.is_audio, is_midi=args.is_midi, is_input=args.is_input, is_output=args.is_output, is_physical=args.is_physical, can_monitor=args.can_monitor, is_terminal=args.is_terminal) or 0)
+    params = dict(pattern=args.pattern,
+                  is_audio=args.is_audio, is_midi=args.is_midi, is_input=args.is_input, is_output=args.is_output, is_physical=args.is_physical, can_monitor=args.can_monitor, is_terminal=args.is_terminal)
+
+    # forward to the control daemon, if it is running
+    try:
+        json.dump(call('list_ports', params), sys.stdout, indent=2)
+    except DaemonError as exc:
+        sys.exit("error: {}".format(exc))
+    except DaemonUnavailable:
+        pass
+    else:
+        sys.exit(0)
+
+    sys.exit(list_jack_ports(client_name=args.client_name, **params) or 0)
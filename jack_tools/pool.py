@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""Share JACK clients between calls of the jack_tools functions.
+
+Registering a JACK client with the server takes several milliseconds, and
+each client briefly shows up in the graph. The functions of the jack_tools
+scripts accept an existing client via their 'client' argument. Without one,
+they acquire a client with 'open_client'. This returns the client of the
+innermost active ClientPool, if there is one, and otherwise a new client,
+which is closed after use. Within a pool, a series of calls therefore
+registers only one client:
+
+    from pool import ClientPool
+    from port_tools import connect_ports
+
+    with ClientPool():
+        for source, destination in connections:
+            connect_ports(source, destination, 'calvo')
+
+Pools are not thread-safe and should be used by one thread at a time.
+
+"""
+
+from contextlib import contextmanager
+
+import jack
+
+
+# Active pools, innermost last, see 'ClientPool.__enter__'
+_active_pools = []
+
+
+def create_client(client_name):
+    """Return a new jack.Client with the given name.
+
+    Raises ConnectionError if the client could not be created.
+
+    """
+    try:
+        return jack.Client(client_name)
+    except jack.JackError as exc:
+        raise ConnectionError("Could not create JACK client: {}".format(exc))
+
+
+class ClientPool:
+    """Keep one JACK client per name open for reuse until the pool is closed.
+
+    Used as a context manager, the pool is activated, so 'open_client'
+    returns its clients, and all clients are closed on exit.
+
+    """
+
+    def __init__(self):
+        self.clients = {}
+
+    def __enter__(self):
+        _active_pools.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _active_pools.remove(self)
+        self.close()
+
+    def acquire(self, client_name):
+        """Return the client with the given name, creating it on first use."""
+        client = self.clients.get(client_name)
+
+        if client is None:
+            client = self.clients[client_name] = create_client(client_name)
+
+        return client
+
+    def close(self):
+        """Close all clients of the pool."""
+        for client in self.clients.values():
+            client.close()
+
+        self.clients.clear()
+
+
+@contextmanager
+def open_client(client_name, client=None):
+    """Context manager providing a JACK client.
+
+    Provides client, if given, or the client with the given name of the
+    innermost active pool. Both are left open. Otherwise a new client is
+    created and closed on exit.
+
+    Raises ConnectionError if the client could not be created.
+
+    """
+    if client is not None:
+        yield client
+    elif _active_pools:
+        yield _active_pools[-1].acquire(client_name)
+    else:
+        client = create_client(client_name)
+
+        try:
+            yield client
+        finally:
+            client.close()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+"""Report changes to the JACK ports and connections as they happen.
+
+Keeps a registry of all ports and connections in memory, which is updated
+from the JACK client registration, port registration, port connection and
+port rename callbacks, so the ports are only enumerated once on start-up.
+Each change is reported as a JSON object on a separate line:
+
+    {"event": "client-added", "client": "..."}
+    {"event": "client-removed", "client": "..."}
+    {"event": "port-added", "port": {"name": "...", "type": "audio", "direction": "capture", ...}}
+    {"event": "port-removed", "name": "..."}
+    {"event": "port-renamed", "name": "...", "old": "..."}
+    {"event": "connected", "source": "...", "destination": "..."}
+    {"event": "disconnected", "source": "...", "destination": "..."}
+
+On start-up, the current ports and connections are reported as "client-added",
+"port-added" and "connected" events. If the control daemon (see
+control_daemon.py), which keeps such a registry too, is running, the events
+are received from it instead of registering another JACK client.
+
+"""
+
+import argparse
+import json
+import os
+import queue
+import re
+import select
+import sys
+
+if __package__:
+    from .control_client import DaemonError, DaemonUnavailable, subscribe
+    from .pool import create_client
+    from .port_tools import get_connections
+else:
+    # run as a script
+    from control_client import DaemonError, DaemonUnavailable, subscribe
+    from pool import create_client
+    from port_tools import get_connections
+
+
+def _port_data(port):
+    return {
+        'name': port.name,
+        'type': 'audio' if port.is_audio else 'midi' if port.is_midi else 'other',
+        'direction': 'playback' if port.is_input else 'capture',
+        'physical': port.is_physical,
+        'terminal': port.is_terminal,
+        'can_monitor': port.can_monitor,
+    }
+
+
+def _client_name(port_name):
+    return port_name.split(':', 1)[0]
+
+
+class PortRegistry:
+    """In-memory registry of JACK clients, ports and connections, updated by change events."""
+
+    def __init__(self):
+        self.clients = set()
+        self.ports = {}
+        self.connections = set()
+
+    def apply(self, event):
+        """Apply a change event dict to the registry and return the list of resulting events.
+
+        Events which do not change the registry, e.g. for a port which is
+        already registered, result in no events. Events implied by the change
+        are added, e.g. "disconnected" events for the connections of a removed
+        port, or "client-added" for the first port of an unknown client.
+
+        """
+        kind = event['event']
+
+        if kind == 'port-added':
+            port = event['port']
+            name = port['name']
+
+            if self.ports.get(name) == port:
+                return []
+
+            events = self.apply({'event': 'port-removed', 'name': name})
+            events.extend(self.apply({'event': 'client-added', 'client': _client_name(name)}))
+            self.ports[name] = port
+            return events + [event]
+        elif kind == 'port-removed':
+            name = event['name']
+
+            if name not in self.ports:
+                return []
+
+            events = []
+
+            for source, destination in sorted(self.connections):
+                if name in (source, destination):
+                    events.extend(self.apply({'event': 'disconnected', 'source': source,
+                                              'destination': destination}))
+
+            del self.ports[name]
+            return events + [event]
+        elif kind == 'port-renamed':
+            old, name = event['old'], event['name']
+
+            if old not in self.ports or name in self.ports:
+                return []
+
+            self.ports[name] = dict(self.ports.pop(old), name=name)
+            self.connections = {tuple(name if n == old else n for n in connection)
+                                for connection in self.connections}
+            return [event]
+        elif kind in ('connected', 'disconnected'):
+            connection = (event['source'], event['destination'])
+
+            if (connection in self.connections) == (kind == 'connected'):
+                return []
+
+            if kind == 'connected':
+                self.connections.add(connection)
+            else:
+                self.connections.discard(connection)
+
+            return [event]
+        elif kind == 'client-added':
+            if event['client'] in self.clients:
+                return []
+
+            self.clients.add(event['client'])
+            return [event]
+        elif kind == 'client-removed':
+            client = event['client']
+
+            if client not in self.clients:
+                return []
+
+            events = []
+
+            for name in [name for name in self.ports if _client_name(name) == client]:
+                events.extend(self.apply({'event': 'port-removed', 'name': name}))
+
+            self.clients.discard(client)
+            return events + [event]
+
+        raise ValueError("Unknown event: {}".format(kind))
+
+    def sync(self, ports, connections):
+        """Update the registry to a complete list of port data dicts and connections.
+
+        Returns the list of change events, which is empty if the registry was
+        up-to-date.
+
+        """
+        ports = {port['name']: port for port in ports}
+        connections = {tuple(connection) for connection in connections}
+        events = []
+
+        for source, destination in sorted(self.connections - connections):
+            events.extend(self.apply({'event': 'disconnected', 'source': source,
+                                      'destination': destination}))
+
+        for name in [name for name in self.ports if name not in ports]:
+            events.extend(self.apply({'event': 'port-removed', 'name': name}))
+
+        for port in ports.values():
+            events.extend(self.apply({'event': 'port-added', 'port': port}))
+
+        for source, destination in sorted(connections - self.connections):
+            events.extend(self.apply({'event': 'connected', 'source': source,
+                                      'destination': destination}))
+
+        return events
+
+    def snapshot(self):
+        """Return dict with sorted lists of all 'clients', 'ports' and 'connections'."""
+        return {
+            'clients': sorted(self.clients),
+            'ports': [self.ports[name] for name in sorted(self.ports)],
+            'connections': sorted(self.connections),
+        }
+
+    def port_info(self):
+        """Return the port names grouped like client.get_port_info."""
+        res = {
+            'all': [],
+            'audio': {'playback': [], 'capture': []},
+            'midi': {'playback': [], 'capture': []},
+        }
+
+        for name, port in self.ports.items():
+            res['all'].append(name)
+
+            if port['type'] in ('audio', 'midi'):
+                res[port['type']][port['direction']].append(name)
+
+        return res
+
+    def get_port_names(self, pattern='', is_audio=False, is_midi=False, is_input=False,
+                       is_output=False, is_physical=False, can_monitor=False, is_terminal=False):
+        """Return names of the ports matching the conditions, like list_ports.get_port_names."""
+        regex = re.compile(pattern) if pattern else None
+
+        if is_audio and not is_midi:
+            port_type = 'audio'
+        elif is_midi and not is_audio:
+            port_type = 'midi'
+        else:
+            port_type = None
+
+        names = []
+
+        for name, port in self.ports.items():
+            if ((regex and not regex.search(name)) or
+                    (port_type and port['type'] != port_type) or
+                    (is_input and port['direction'] != 'playback') or
+                    (is_output and port['direction'] != 'capture') or
+                    (is_physical and not port['physical']) or
+                    (can_monitor and not port['can_monitor']) or
+                    (is_terminal and not port['terminal'])):
+                continue
+
+            names.append(name)
+
+        return names
+
+
+class PortMonitor:
+    """Keep a PortRegistry up to date from the callbacks of a JACK client.
+
+    Must be created before the client is activated. The callbacks, which run
+    in a JACK thread, only queue the changes. Whenever 'fileno' is readable,
+    'poll' must be called to apply them to the registry.
+
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.registry = PortRegistry()
+        self.queue = queue.SimpleQueue()
+        self._rfd, self._wfd = os.pipe()
+        os.set_blocking(self._rfd, False)
+        os.set_blocking(self._wfd, False)
+        client.set_client_registration_callback(self._on_client)
+        # ports which are gone already are passed as None and trigger a re-sync
+        client.set_port_registration_callback(self._on_port, only_available=False)
+        client.set_port_connect_callback(self._on_connect, only_available=False)
+        client.set_port_rename_callback(self._on_rename, only_available=False)
+
+    def fileno(self):
+        return self._rfd
+
+    def close(self):
+        os.close(self._rfd)
+        os.close(self._wfd)
+
+    def wake(self):
+        """Make 'fileno' readable."""
+        try:
+            os.write(self._wfd, b'\0')
+        except BlockingIOError:
+            # the pipe is full, so it is readable anyway
+            pass
+
+    def _push(self, event):
+        self.queue.put(event)
+        self.wake()
+
+    def _on_client(self, name, register):
+        if name != self.client.name:
+            self._push({'event': 'client-added' if register else 'client-removed',
+                        'client': name})
+
+    def _on_port(self, port, register):
+        if port is None:
+            self._push(None)
+        elif register:
+            self._push({'event': 'port-added', 'port': _port_data(port)})
+        else:
+            self._push({'event': 'port-removed', 'name': port.name})
+
+    def _on_connect(self, a, b, connect):
+        if a is None or b is None:
+            self._push(None)
+            return
+
+        if a.is_input:
+            a, b = b, a
+
+        self._push({'event': 'connected' if connect else 'disconnected',
+                    'source': a.name, 'destination': b.name})
+
+    def _on_rename(self, port, old, new):
+        self._push({'event': 'port-renamed', 'name': new, 'old': old})
+
+    def load(self):
+        """Enumerate all ports and connections, update the registry and return the changes."""
+        ports = [_port_data(port) for port in self.client.get_ports()]
+        return self.registry.sync(ports, get_connections(self.client))
+
+    def poll(self):
+        """Apply the queued changes to the registry and return the resulting events."""
+        try:
+            while os.read(self._rfd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        events = []
+        resync = False
+
+        while True:
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if event is None:
+                resync = True
+            else:
+                events.extend(self.registry.apply(event))
+
+        if resync:
+            events.extend(self.load())
+
+        return events
+
+
+def _print_events(events):
+    for event in events:
+        print(json.dumps(event, sort_keys=True))
+
+    sys.stdout.flush()
+
+
+def monitor_ports(client_name='port-monitor'):
+    """Print port and connection changes to stdout until the JACK server shuts down.
+
+    Returns the reason given by the JACK server.
+
+    Raises ConnectionError if the client could not be created.
+
+    """
+    client = create_client(client_name)
+    monitor = PortMonitor(client)
+    shutdown = []
+
+    def on_shutdown(status, reason):
+        shutdown.append(reason)
+        monitor.wake()
+
+    client.set_shutdown_callback(on_shutdown)
+    client.activate()
+
+    try:
+        _print_events(monitor.load())
+
+        while not shutdown:
+            select.select([monitor], [], [])
+            _print_events(monitor.poll())
+
+        return shutdown[0]
+    finally:
+        if not shutdown:
+            client.deactivate()
+            client.close()
+
+        monitor.close()
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument(
+        '-c', '--client-name',
+        metavar='NAME',
+        default='port-monitor',
+        help="JACK client name, if the control daemon is not running (default: %(default)s)")
+
+    args = ap.parse_args(args)
+
+    try:
+        events = subscribe()
+        snapshot = next(events)
+    except DaemonError as exc:
+        return "error: {}".format(exc)
+    except DaemonUnavailable:
+        events = None
+
+    try:
+        if events is None:
+            return "error: JACK server shut down: {}".format(monitor_ports(args.client_name))
+
+        _print_events(PortRegistry().sync(snapshot['ports'], snapshot['connections']))
+
+        for event in events:
+            _print_events([event])
+
+        return "error: control daemon closed the connection."
+    except ConnectionError as exc:
+        return str(exc)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
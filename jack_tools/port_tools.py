@@ -1,46 +1,77 @@
 #!/usr/bin/python3
 """Assorted tools for handling a JACK port"""
 
+import csv
+import fnmatch
 import jack
+import json
 import sys
 import argparse
 
+if __package__:
+    from .control_client import DaemonError, DaemonUnavailable, call
+    from .pool import open_client
+else:
+    # run as a script
+    from control_client import DaemonError, DaemonUnavailable, call
+    from pool import open_client
 
-def clear_port(port, client_name="jack_client", **kwarg):
+
+def _check_ports(src_port, dst_port, source, destination):
+    # Check for src=output
+    if not dst_port.is_input:
+        raise TypeError(
+            f'Error connecting ports: {destination} is not an INPUT port!')
+
+    # Check for dst=input
+    if not src_port.is_output:
+        raise TypeError(
+            f'Error connecting ports: {source} is not an OUTPUT port!')
+
+    # Check both port to be audio
+    if src_port.is_audio and not dst_port.is_audio or dst_port.is_audio and not dst_port.is_audio:
+        raise TypeError(
+            'Error connecting ports: Both ports are expected to be the same type.')
+
+    # Check both midi ports
+    if src_port.is_midi and not dst_port.is_midi or dst_port.is_midi and not dst_port.is_midi:
+        raise TypeError(
+            'Error connecting ports: Both ports are expected to be the same type.')
+
+
+def clear_port(port, client_name="jack_client", client=None, **kwarg):
     """ Removes all incoming/outgoing connections from/to a port
 
     Arguments:
         port: (string) -- Port name to clear.
+        client: (jack.Client) -- Client to use instead of acquiring one with pool.open_client.
 
     Raises:
         ConnectionError: "If JACK client could not connect."
         ValueError: "If no port is found, or the connection was unsuccesfull"
     """
 
-    try:
-        client = jack.Client(client_name)
-    except jack.JackError as exc:
-        raise ConnectionError("Could not create JACK client: {}".format(exc))
-
-    src_ports_names = port.split(',')
-    for src_port_name in src_ports_names:
-        try:
-            jack_port = client.get_port_by_name(src_port_name)
-            jack_ports = client.get_all_connections(jack_port)
+    with open_client(client_name, client) as client:
+        src_ports_names = port.split(',')
+        for src_port_name in src_ports_names:
+            try:
+                jack_port = client.get_port_by_name(src_port_name)
+                jack_ports = client.get_all_connections(jack_port)
 
-            for cport in jack_ports:
-                if jack_port.is_output:
-                    connect_ports(
-                        src_port_name, cport.name, client_name, True)
-                elif jack_port.is_input:
-                    connect_ports(
-                        cport.name, src_port_name, client_name, True)
+                for cport in jack_ports:
+                    if jack_port.is_output:
+                        connect_ports(
+                            src_port_name, cport.name, client_name, True, client=client)
+                    elif jack_port.is_input:
+                        connect_ports(
+                            cport.name, src_port_name, client_name, True, client=client)
 
-        except jack.JackError as exc2:
-            raise ValueError("Could not clear port: {}".format(exc2))
+            except jack.JackError as exc2:
+                raise ValueError("Could not clear port: {}".format(exc2))
 
 
-def connect_ports(source, destination, client_name, disconnect=False, quiet=False, **kwarg):
+def connect_ports(source, destination, client_name, disconnect=False, quiet=False,
+                  client=None, **kwarg):
     """ Connects/Disconnects two JACK ports.
 
     Parameters
@@ -55,6 +86,8 @@ def connect_ports(source, destination, client_name, disconnect=False, quiet=Fals
         Perform a disconnection instead, by default False
     quiet: bool, optional
         Do not raise exception is the connection cannot be made due to (non)exisiting connections between the ports, by default False.
+    client: jack.Client, optional
+        Client to use, by default one is acquired with pool.open_client.
 
     Raises
     ------
@@ -66,57 +99,455 @@ def connect_ports(source, destination, client_name, disconnect=False, quiet=Fals
         Port types are not compatible.
     """
 
-    try:
-        client = jack.Client(client_name)
-    except jack.JackError as exc:
-        raise ConnectionError("Could not create JACK client: {}".format(exc))
+    with open_client(client_name, client) as client:
+        try:
+            src_port = client.get_port_by_name(source)
+            dst_port = client.get_port_by_name(destination)
+            src_connections = client.get_all_connections(src_port)
 
-    try:
-        src_port = client.get_port_by_name(source)
-        dst_port = client.get_port_by_name(destination)
-        src_connections = client.get_all_connections(src_port)
+        except jack.JackError as exc:
+            raise ValueError("Could not get JACK port: {}".format(exc))
 
-    except jack.JackError as exc:
-        raise ValueError("Could not get JACK port: {}".format(exc))
+        _check_ports(src_port, dst_port, source, destination)
 
-    # Check for src=output
-    if not dst_port.is_input:
-        raise TypeError(
-            f'Error connecting ports: {destination} is not an INPUT port!')
+        if not disconnect:
+            try:
+                client.connect(src_port, dst_port)
+            except jack.JackError as exc2:
+                raise ValueError(
+                    f'Could not make the connection between {source} => {destination} : {exc2}')
+        else:
+            existingConnection = False
+            for port in src_connections:
+                if port == dst_port:
+                    existingConnection = True
+                    break
+            if existingConnection:
+                client.disconnect(src_port, dst_port)
+            else:
+                if not quiet:
+                    raise ValueError(
+                        f'Could not make the connection between {source} => {destination}')
 
-    # Check for dst=input
-    if not src_port.is_output:
-        raise TypeError(
-            f'Error connecting ports: {source} is not an OUTPUT port!')
 
-    # Check both port to be audio
-    if src_port.is_audio and not dst_port.is_audio or dst_port.is_audio and not dst_port.is_audio:
-        raise TypeError(
-            'Error connecting ports: Both ports are expected to be the same type.')
+def get_connections(client):
+    """ Returns all connections in the JACK graph.
 
-    # Check both midi ports
-    if src_port.is_midi and not dst_port.is_midi or dst_port.is_midi and not dst_port.is_midi:
-        raise TypeError(
-            'Error connecting ports: Both ports are expected to be the same type.')
+    Parameters
+    ----------
+    client: jack.Client
+        Client used to query the graph.
+
+    Returns
+    -------
+    set
+        (source, destination) tuples of port names.
+    """
+
+    connections = set()
+
+    for src_port in client.get_ports(is_output=True):
+        for dst_port in client.get_all_connections(src_port):
+            connections.add((src_port.name, dst_port.name))
+
+    return connections
+
+
+def read_connections(fp, format=None):
+    """ Reads a list of connections from a JSON or CSV file.
+
+    JSON files hold a list of [source, destination] pairs or of objects with
+    "source" and "destination" keys. CSV files have one connection per row, with
+    the source and destination port names in the first two columns. Empty rows,
+    rows starting with '#' and a "source,destination" header row are ignored.
+
+    Parameters
+    ----------
+    fp: file
+        Text file to read.
+    format: string, optional
+        'json' or 'csv', by default guessed from the first character of the file.
+
+    Returns
+    -------
+    list
+        (source, destination) tuples of port names.
+
+    Raises
+    ------
+    ValueError
+        The file content is not a valid connection list.
+    """
+
+    data = fp.read()
+
+    if format is None:
+        format = 'json' if data.lstrip()[:1] in ('[', '{') else 'csv'
+
+    connections = []
+
+    if format == 'json':
+        for item in json.loads(data):
+            if isinstance(item, dict):
+                item = (item.get('source'), item.get('destination'))
+
+            if (not isinstance(item, (list, tuple)) or len(item) != 2 or
+                    not all(isinstance(name, str) for name in item)):
+                raise ValueError(f'Invalid connection: {item!r}')
+
+            connections.append(tuple(item))
+    else:
+        for row in csv.reader(data.splitlines()):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+
+            if len(row) < 2:
+                raise ValueError(f'Invalid connection: {",".join(row)!r}')
+
+            row = (row[0].strip(), row[1].strip())
+
+            if row != ('source', 'destination'):
+                connections.append(row)
+
+    return connections
+
+
+def diff_connections(current, desired, exclusive=False):
+    """ Computes the changes needed to turn the current connections into the desired ones.
+
+    Parameters
+    ----------
+    current: iterable
+        (source, destination) tuples of the existing connections.
+    desired: iterable
+        (source, destination) tuples of the wanted connections.
+    exclusive: bool, optional
+        Remove all other connections in the graph. By default only the other
+        connections of ports in desired are removed.
+
+    Returns
+    -------
+    tuple
+        Sorted lists of (source, destination) tuples to connect and to disconnect.
+    """
+
+    current = set(current)
+    desired = set(desired)
+    ports = {name for connection in desired for name in connection}
+    to_connect = desired - current
+    to_disconnect = {(src, dst) for src, dst in current - desired
+                     if exclusive or src in ports or dst in ports}
+    return sorted(to_connect), sorted(to_disconnect)
+
+
+def apply_connections(connections, client_name="jack_client", exclusive=False, dry_run=False,
+                      client=None):
+    """ Makes the JACK graph match a list of connections, using a single client.
+
+    All ports are checked before any connection is changed. Connections to be
+    removed are disconnected before the new ones are made.
+
+    Parameters
+    ----------
+    connections: iterable
+        (source, destination) tuples of port names or aliases.
+    client_name: [string]
+        JACK Client name.
+    exclusive: bool, optional
+        Remove all other connections in the graph, by default False (see
+        diff_connections).
+    dry_run: bool, optional
+        Only compute the changes, by default False.
+    client: jack.Client, optional
+        Client to use, by default one is acquired with pool.open_client.
+
+    Returns
+    -------
+    tuple
+        Lists of (source, destination) tuples connected and disconnected.
+
+    Raises
+    ------
+    ConnectionError
+        Could not create JACK client:
+    ValueError
+        Port names not found, or a connection could not be changed.
+    TypeError
+        Port types are not compatible.
+    """
+
+    with open_client(client_name, client) as client:
+        ports = {}
+        desired = []
+
+        for source, destination in connections:
+            for name in (source, destination):
+                if name not in ports:
+                    try:
+                        ports[name] = client.get_port_by_name(name)
+                    except jack.JackError as exc:
+                        raise ValueError("Could not get JACK port: {}".format(exc))
+
+            _check_ports(ports[source], ports[destination], source, destination)
+            # aliases are resolved to the port names reported by the graph
+            desired.append((ports[source].name, ports[destination].name))
+
+        to_connect, to_disconnect = diff_connections(get_connections(client), desired, exclusive)
+
+        if not dry_run:
+            _apply_changes(client, to_connect, to_disconnect)
 
-    if not disconnect:
+        return to_connect, to_disconnect
+
+
+def _apply_changes(client, to_connect, to_disconnect):
+    for source, destination in to_disconnect:
         try:
-            client.connect(src_port, dst_port)
-        except jack.JackError as exc2:
+            client.disconnect(source, destination)
+        except jack.JackError as exc:
             raise ValueError(
-                f'Could not make the connection between {source} => {destination} : {exc2}')
+                f'Could not remove the connection between {source} => {destination} : {exc}')
+
+    for source, destination in to_connect:
+        try:
+            client.connect(source, destination)
+        except jack.JackError as exc:
+            raise ValueError(
+                f'Could not make the connection between {source} => {destination} : {exc}')
+
+
+def write_connections(fp, connections, format='json'):
+    """ Writes a list of connections to a JSON or CSV file.
+
+    The file can be read again with read_connections.
+
+    Parameters
+    ----------
+    fp: file
+        Text file to write.
+    connections: iterable
+        (source, destination) tuples of port names.
+    format: string, optional
+        'json' or 'csv', by default 'json'.
+    """
+
+    if format == 'csv':
+        writer = csv.writer(fp, lineterminator='\n')
+        writer.writerow(('source', 'destination'))
+        writer.writerows(connections)
     else:
-        existingConnection = False
-        for port in src_connections:
-            if port == dst_port:
-                existingConnection = True
-                break
-        if existingConnection:
-            client.disconnect(src_port, dst_port)
+        json.dump([{'source': src, 'destination': dst} for src, dst in connections], fp,
+                  indent=2)
+        fp.write('\n')
+
+
+def _match_ports(client, ports, name):
+    # exact names first, since port names may contain glob characters, e.g. a2j's "[14]"
+    if name in ports:
+        return [ports[name]], False
+
+    try:
+        return [client.get_port_by_name(name)], False
+    except jack.JackError:
+        pass
+
+    return [ports[match] for match in fnmatch.filter(ports, name)], True
+
+
+def expand_connections(connections, client):
+    """ Resolves the port names in a list of connections against the JACK graph.
+
+    Port names which do not exist are used as glob patterns (see fnmatch), e.g.
+    "a2j:Midi Through *:capture*", so connections survive client renumbering.
+    A pattern matching several ports connects all of them. Pairs of matched
+    ports which can not be connected (e.g. audio to MIDI) are skipped.
+
+    Parameters
+    ----------
+    connections: iterable
+        (source, destination) tuples of port names, aliases or glob patterns.
+    client: jack.Client
+        Client used to query the graph.
+
+    Returns
+    -------
+    tuple
+        Sorted list of (source, destination) tuples of existing port names, and
+        list of the connections none of whose port pairs exist.
+
+    Raises
+    ------
+    TypeError
+        Ports given by exact names are not compatible.
+    """
+
+    ports = {port.name: port for port in client.get_ports()}
+    expanded = set()
+    missing = []
+
+    for source, destination in connections:
+        src_ports, src_glob = _match_ports(client, ports, source)
+        dst_ports, dst_glob = _match_ports(client, ports, destination)
+        found = False
+
+        for src_port in src_ports:
+            for dst_port in dst_ports:
+                try:
+                    _check_ports(src_port, dst_port, src_port.name, dst_port.name)
+                except TypeError:
+                    if src_glob or dst_glob:
+                        continue
+
+                    raise
+
+                expanded.add((src_port.name, dst_port.name))
+                found = True
+
+        if not found:
+            missing.append((source, destination))
+
+    return sorted(expanded), missing
+
+
+def snapshot_connections(client_name="jack_client", client=None):
+    """ Returns a sorted list of all (source, destination) connections in the JACK graph. """
+
+    with open_client(client_name, client) as client:
+        return sorted(get_connections(client))
+
+
+def restore_connections(connections, client_name="jack_client", dry_run=False, client=None):
+    """ Brings the whole JACK graph back to a snapshot, using a single client.
+
+    Only the missing connections are made and only the connections not in the
+    snapshot are removed, so restoring the same snapshot again changes nothing.
+    See expand_connections for glob patterns in port names.
+
+    Parameters
+    ----------
+    connections: iterable
+        (source, destination) tuples, e.g. from snapshot_connections.
+    client_name: [string]
+        JACK Client name.
+    dry_run: bool, optional
+        Only compute the changes, by default False.
+    client: jack.Client, optional
+        Client to use, by default one is acquired with pool.open_client.
+
+    Returns
+    -------
+    tuple
+        Lists of (source, destination) tuples connected, disconnected and not
+        found in the graph.
+
+    Raises
+    ------
+    ConnectionError
+        Could not create JACK client:
+    ValueError
+        A connection could not be changed.
+    TypeError
+        Port types are not compatible.
+    """
+
+    with open_client(client_name, client) as client:
+        desired, missing = expand_connections(connections, client)
+        to_connect, to_disconnect = diff_connections(get_connections(client), desired, True)
+
+        if not dry_run:
+            _apply_changes(client, to_connect, to_disconnect)
+
+        return to_connect, to_disconnect, missing
+
+
+def _read_file(file, format):
+    if file == '-':
+        return read_connections(sys.stdin, format)
+
+    with open(file, newline='') as fp:
+        return read_connections(fp, format)
+
+
+def _connect_command(source, destination, client_name, disconnect=False, quiet=False, **kwarg):
+    # forward to the control daemon, if it is running
+    try:
+        if disconnect:
+            call('disconnect', {'source': source, 'destination': destination, 'quiet': quiet})
         else:
-            if not quiet:
-                raise ValueError(
-                    f'Could not make the connection between {source} => {destination}')
+            call('connect', {'source': source, 'destination': destination})
+    except DaemonUnavailable:
+        connect_ports(source, destination, client_name, disconnect, quiet)
+
+
+def _clear_command(port, client_name="jack_client", **kwarg):
+    try:
+        call('clear', {'port': port})
+    except DaemonUnavailable:
+        clear_port(port, client_name)
+
+
+def apply_file(file, client_name="jack_client", format=None, exclusive=False, dry_run=False,
+               **kwarg):
+    """ Makes the JACK graph match the connections listed in a JSON or CSV file.
+
+    Prints the connections made and removed as a JSON object. See
+    read_connections for the file formats and apply_connections for the other
+    parameters. Uses the control daemon, if it is running.
+    """
+
+    connections = _read_file(file, format)
+
+    try:
+        result = call('apply', {'connections': connections, 'exclusive': exclusive,
+                                'dry_run': dry_run})
+    except DaemonUnavailable:
+        connected, disconnected = apply_connections(connections, client_name, exclusive, dry_run)
+        result = {'connected': connected, 'disconnected': disconnected}
+
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+def snapshot_file(file='-', client_name="jack_client", format=None, **kwarg):
+    """ Writes all connections in the JACK graph to a JSON or CSV file.
+
+    Uses the control daemon, if it is running.
+    """
+
+    if format is None:
+        format = 'csv' if file.endswith('.csv') else 'json'
+
+    try:
+        connections = call('snapshot')
+    except DaemonUnavailable:
+        connections = snapshot_connections(client_name)
+
+    if file == '-':
+        write_connections(sys.stdout, connections, format)
+    else:
+        with open(file, 'w', newline='') as fp:
+            write_connections(fp, connections, format)
+
+
+def restore_file(file, client_name="jack_client", format=None, dry_run=False, **kwarg):
+    """ Brings the JACK graph back to a snapshot file written by snapshot_file.
+
+    Prints the connections made, removed and not found as a JSON object and
+    returns 1, if any connection was not found. Uses the control daemon, if it
+    is running.
+    """
+
+    connections = _read_file(file, format)
+
+    try:
+        result = call('restore', {'connections': connections, 'dry_run': dry_run})
+    except DaemonUnavailable:
+        connected, disconnected, missing = restore_connections(connections, client_name, dry_run)
+        result = {'connected': connected, 'disconnected': disconnected, 'missing': missing}
+
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return 1 if result['missing'] else 0
 
 
 if __name__ == '__main__':
@@ -133,7 +564,7 @@ if __name__ == '__main__':
         'clear', help='Remove all connections from a port or a comma separated lists of ports')
     parser_clear_port.add_argument(
         'port', help='Port or comma separated list of ports to clear.')
-    parser_clear_port.set_defaults(func=clear_port)
+    parser_clear_port.set_defaults(func=_clear_command)
 
     # Connect ports
     parser_connect = subparses.add_parser(
@@ -156,10 +587,66 @@ if __name__ == '__main__':
         default=False,
         help="Do not raise exception is the connection cannot be made due to (non)exisiting connections between the ports")
 
-    parser_connect.set_defaults(func=connect_ports)
+    parser_connect.set_defaults(func=_connect_command)
+
+    # Apply connection list
+    parser_apply = subparses.add_parser(
+        'apply', help='Make the connections listed in a JSON or CSV file and remove all other connections of their ports')
+    parser_apply.add_argument(
+        'file',
+        help="JSON or CSV file with the connections ('-' reads standard input)")
+    parser_apply.add_argument(
+        '-f', '--format',
+        choices=['json', 'csv'],
+        help="File format (default: guessed from the content)")
+    parser_apply.add_argument(
+        '-x', '--exclusive',
+        action='store_true',
+        default=False,
+        help="Remove all connections in the JACK graph which are not listed in the file")
+    parser_apply.add_argument(
+        '-n', '--dry-run',
+        action='store_true',
+        default=False,
+        help="Only print the connections which would be made and removed")
+    parser_apply.set_defaults(func=apply_file)
+
+    # Snapshot connection graph
+    parser_snapshot = subparses.add_parser(
+        'snapshot', help='Write all connections in the JACK graph to a JSON or CSV file')
+    parser_snapshot.add_argument(
+        'file',
+        nargs='?',
+        default='-',
+        help="Output file (default: standard output)")
+    parser_snapshot.add_argument(
+        '-f', '--format',
+        choices=['json', 'csv'],
+        help="File format (default: csv for *.csv files, otherwise json)")
+    parser_snapshot.set_defaults(func=snapshot_file)
+
+    # Restore connection graph
+    parser_restore = subparses.add_parser(
+        'restore', help='Make the JACK graph match a snapshot, changing only the differing connections')
+    parser_restore.add_argument(
+        'file',
+        help="Snapshot file, port names may be glob patterns ('-' reads standard input)")
+    parser_restore.add_argument(
+        '-f', '--format',
+        choices=['json', 'csv'],
+        help="File format (default: guessed from the content)")
+    parser_restore.add_argument(
+        '-n', '--dry-run',
+        action='store_true',
+        default=False,
+        help="Only print the connections which would be made and removed")
+    parser_restore.set_defaults(func=restore_file)
 
     if len(sys.argv) == 1:
         parser.print_help(sys.stderr)
         sys.exit(1)
     arguments = parser.parse_args()
-    arguments.func(**vars(arguments))
+    try:
+        sys.exit(arguments.func(**vars(arguments)) or 0)
+    except DaemonError as exc:
+        sys.exit("error: {}".format(exc))
@@ -31,6 +31,14 @@ import sys
 import json
 import jack
 
+if __package__:
+    from .control_client import DaemonError, DaemonUnavailable, call
+    from .pool import open_client
+else:
+    # run as a script
+    from control_client import DaemonError, DaemonUnavailable, call
+    from pool import open_client
+
 
 STATE_LABELS = {
     jack.ROLLING: "rolling",
@@ -40,6 +48,56 @@ STATE_LABELS = {
 }
 
 
+def query_transport(client_name='transporter', client=None):
+    """Return dict with the JACK transport state and position.
+
+    client is used instead of acquiring one with pool.open_client.
+    """
+    with open_client(client_name, client) as client:
+        state, info = client.transport_query()
+
+    res = {
+        "state": STATE_LABELS[state],
+    }
+    for field in sorted(info):
+        res[field] = info[field]
+    return res
+
+
+def transport(command='status', client_name='transporter', client=None):
+    """Run a transport command and return its result.
+
+    'status' returns the transport state label and 'query' the dict returned
+    by query_transport. 'rewind', 'start', 'stop' and 'toggle' change the
+    transport state and return None.
+
+    client is used instead of acquiring one with pool.open_client.
+    """
+    with open_client(client_name, client) as client:
+        if command == 'query':
+            return query_transport(client=client)
+
+        state = client.transport_state
+
+        if command == 'status':
+            return STATE_LABELS[state]
+        elif command == 'start':
+            if state == jack.STOPPED:
+                client.transport_start()
+        elif command == 'stop':
+            if state != jack.STOPPED:
+                client.transport_stop()
+        elif command == 'toggle':
+            if state == jack.STOPPED:
+                client.transport_start()
+            else:
+                client.transport_stop()
+        elif command == 'rewind':
+            client.transport_frame = 0
+        else:
+            raise ValueError("Unknown transport command: {}".format(command))
+
+
 def main(args=None):
     ap = argparse.ArgumentParser(description=__doc__)
     ap.add_argument(
@@ -61,47 +119,31 @@ def main(args=None):
 
     args = ap.parse_args(args)
 
+    # forward to the control daemon, if it is running
     try:
-        client = jack.Client(args.client_name)
-    except jack.JackError as exc:
-        return "Could not create JACK client: {}".format(exc)
+        res = call('transport', {'command': args.command})
+    except DaemonError as exc:
+        return "error: {}".format(exc)
+    except DaemonUnavailable:
+        try:
+            res = transport(args.command, args.client_name)
+        except ConnectionError as exc:
+            return str(exc)
 
-    state = client.transport_state
     result = 0
 
     if args.command == 'status':
         if args.verbose:
-            print("JACK transport is {}.".format(STATE_LABELS[state]))
+            print("JACK transport is {}.".format(res))
         else:
-            print(STATE_LABELS[state])
+            print(res)
       #   result = 1 if state == jack.STOPPED else 0
         result = 0
     elif args.command == 'query':
-        res = {
-            "state": STATE_LABELS[state],
-        }
-        #   print("State: {}".format(STATE_LABELS[state]))
-        info = client.transport_query()[1]
-        for field in sorted(info):
-            res[field] = info[field]
         json.dump(res, sys.stdout, indent=2)
       #   result = 1 if state == jack.STOPPED else 0
         result = 0
-    elif args.command == 'start':
-        if state == jack.STOPPED:
-            client.transport_start()
-    elif args.command == 'stop':
-        if state != jack.STOPPED:
-            client.transport_stop()
-    elif args.command == 'toggle':
-        if state == jack.STOPPED:
-            client.transport_start()
-        else:
-            client.transport_stop()
-    elif args.command == 'rewind':
-        client.transport_frame = 0
 
-    client.close()
     return result
 
 
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+"""Locate LV2 bundles on disk and keep persistent caches keyed by bundle or file changes.
+
+The functions in this module do not use lilv, so that cached data can be
+validated and returned without loading any LV2 bundle.
+
+"""
+
+import json
+import os
+import sys
+from hashlib import blake2b
+from os.path import expanduser, isfile, join, realpath
+from urllib.parse import unquote, urlparse
+
+
+if sys.platform == 'darwin':
+    DEFAULT_LV2_PATH = ("~/.lv2:~/Library/Audio/Plug-Ins/LV2:"
+                        "/usr/local/lib/lv2:/usr/lib/lv2:/Library/Audio/Plug-Ins/LV2")
+else:
+    DEFAULT_LV2_PATH = "~/.lv2:/usr/local/lib/lv2:/usr/lib/lv2"
+
+
+def get_lv2_path(lv2_path=None):
+    """Return list of directories searched for LV2 bundles.
+
+    If lv2_path is not given, use the LV2_PATH environment variable or, if it
+    is not set, the platform default search path.
+
+    """
+    if lv2_path is None:
+        lv2_path = os.environ.get('LV2_PATH') or DEFAULT_LV2_PATH
+
+    if isinstance(lv2_path, str):
+        lv2_path = lv2_path.split(os.pathsep)
+
+    return [expanduser(p) for p in lv2_path if p]
+
+
+def find_bundles(lv2_path=None):
+    """Return sorted list of real paths of all LV2 bundles in the search path.
+
+    A bundle is a directory directly within one of the search path directories,
+    which contains a 'manifest.ttl' file.
+
+    """
+    bundles = set()
+
+    for path in get_lv2_path(lv2_path):
+        try:
+            entries = os.scandir(path)
+        except OSError:
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir() and isfile(join(entry.path, 'manifest.ttl')):
+                    bundles.add(realpath(entry.path))
+
+    return sorted(bundles)
+
+
+def bundle_signature(bundle):
+    """Return signature of the Turtle files in a bundle for change detection.
+
+    The signature is a sorted list of [filename, mtime_ns, size] lists, which
+    can be stored in and compared against JSON data as-is.
+
+    """
+    signature = []
+
+    try:
+        entries = os.scandir(bundle)
+    except OSError:
+        return signature
+
+    with entries:
+        for entry in entries:
+            if entry.name.endswith('.ttl') and entry.is_file():
+                st = entry.stat()
+                signature.append([entry.name, st.st_mtime_ns, st.st_size])
+
+    return sorted(signature)
+
+
+def bundle_hash(bundle):
+    """Return hex digest of the names and contents of the Turtle files in a bundle.
+
+    Unlike the signature, the hash only changes when the content of the files
+    changes, not when they are touched or the bundle is re-installed as-is.
+    Return None if the bundle can not be read.
+
+    """
+    try:
+        entries = os.scandir(bundle)
+    except OSError:
+        return None
+
+    with entries:
+        names = sorted(entry.name for entry in entries
+                       if entry.name.endswith('.ttl') and entry.is_file())
+
+    digest = blake2b(digest_size=16)
+
+    for name in names:
+        try:
+            with open(join(bundle, name), 'rb') as fp:
+                data = fp.read()
+        except OSError:
+            return None
+
+        digest.update(b'%s\0%i\0' % (name.encode('utf-8', 'surrogateescape'), len(data)))
+        digest.update(data)
+
+    return digest.hexdigest()
+
+
+def scan_bundles(lv2_path=None):
+    """Return dict mapping path of each installed bundle to its signature."""
+    return {bundle: bundle_signature(bundle) for bundle in find_bundles(lv2_path)}
+
+
+def diff_bundles(old, new):
+    """Return set of bundle paths added, removed or modified between two scans."""
+    return {b for b in set(old) | set(new) if old.get(b) != new.get(b)}
+
+
+def uri_to_bundle(uri):
+    """Return real path of the bundle directory containing a 'file:' URI.
+
+    Return None for non-file URIs.
+
+    """
+    if uri and uri.startswith('file:'):
+        return realpath(os.path.dirname(unquote(urlparse(uri).path)))
+
+
+def file_signature(filenames):
+    """Return signature of the given files for change detection.
+
+    The signature is a sorted list of [filename, mtime_ns, size] lists, with
+    mtime and size set to None for files which do not exist.
+
+    """
+    signature = []
+
+    for filename in filenames:
+        try:
+            st = os.stat(filename)
+        except OSError:
+            signature.append([filename, None, None])
+        else:
+            signature.append([filename, st.st_mtime_ns, st.st_size])
+
+    return sorted(signature)
+
+
+def get_cache_file(name):
+    """Return path of the cache file with the given name in the user cache dir."""
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or expanduser('~/.cache')
+    return join(cache_dir, 'calvo-cli-tools', name)
+
+
+def _write_json(filename, data):
+    """Write data as JSON to filename atomically, creating its directory."""
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmpname = "%s.%i.tmp" % (filename, os.getpid())
+
+    with open(tmpname, 'w', encoding='utf-8') as fp:
+        json.dump(data, fp)
+
+    os.replace(tmpname, filename)
+
+
+def _read_json(filename, version):
+    """Return dict stored by _write_json or None if missing or of another version."""
+    try:
+        with open(filename, encoding='utf-8') as fp:
+            stored = json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(stored, dict) or stored.get('version') != version:
+        return None
+
+    return stored
+
+
+class BundleCache:
+    """Persistent JSON store of entries, which depend on a set of LV2 bundles.
+
+    On creation the installed bundles are scanned and compared to the scan
+    stored with the cache. An entry is only returned by 'lookup' if none of the
+    bundles it depends on has been added, removed or modified since.
+
+    """
+
+    def __init__(self, filename, version=1, lv2_path=None):
+        self.filename = filename
+        self.version = version
+        self.bundles = scan_bundles(lv2_path)
+        self.entries = {}
+        stored = _read_json(filename, version)
+
+        if stored is None:
+            self.valid = False
+            self.changed = set(self.bundles)
+        else:
+            self.entries = stored['entries']
+            self.changed = diff_bundles(stored['bundles'], self.bundles)
+            self.valid = not self.changed
+
+    def lookup(self, key, depends=()):
+        """Return cached data for key or None if it is missing or stale.
+
+        Additional bundles the entry currently depends on can be passed in
+        'depends'.
+
+        """
+        entry = self.entries.get(key)
+
+        if (entry is not None and self.changed.isdisjoint(entry['depends']) and
+                self.changed.isdisjoint(depends)):
+            return entry['data']
+
+    def store(self, key, data, depends):
+        self.entries[key] = {'data': data, 'depends': sorted(depends)}
+
+    def unclaimed(self, claimed=()):
+        """Return changed bundles no cached entry or 'claimed' bundle accounts for.
+
+        Changes to these bundles may affect any entry, e.g. a new bundle with
+        presets for an already cached plugin.
+
+        """
+        unclaimed = self.changed.difference(claimed)
+
+        for entry in self.entries.values():
+            if not unclaimed:
+                break
+
+            unclaimed.difference_update(entry['depends'])
+
+        return unclaimed
+
+    def clear(self):
+        self.entries.clear()
+
+    def prune(self, keys):
+        """Remove all entries whose key is not in keys."""
+        keys = set(keys)
+        self.entries = {k: v for k, v in self.entries.items() if k in keys}
+
+    def values(self):
+        """Return list of data of all entries sorted by key."""
+        return [self.entries[key]['data'] for key in sorted(self.entries)]
+
+    def save(self):
+        """Write cache file atomically and mark cache as up-to-date."""
+        _write_json(self.filename, {
+            'version': self.version,
+            'bundles': self.bundles,
+            'entries': self.entries,
+        })
+        self.changed = set()
+        self.valid = True
+
+
+class FileCache:
+    """Persistent JSON store of entries, which depend on a set of files.
+
+    An entry is only returned by 'lookup' if none of the files it was stored
+    with has been created, removed or modified (by mtime and size) since.
+
+    """
+
+    def __init__(self, filename, version=1):
+        self.filename = filename
+        self.version = version
+        stored = _read_json(filename, version)
+        self.entries = stored['entries'] if stored else {}
+        self.modified = False
+
+    def lookup(self, key, files):
+        """Return cached data for key or None if it is missing or stale."""
+        entry = self.entries.get(key)
+
+        if entry is not None and entry['files'] == file_signature(files):
+            return entry['data']
+
+    def store(self, key, data, files):
+        self.entries[key] = {'data': data, 'files': file_signature(files)}
+        self.modified = True
+
+    def prune(self, keys):
+        """Remove all entries whose key is not in keys."""
+        keys = set(keys)
+        entries = {k: v for k, v in self.entries.items() if k in keys}
+
+        if len(entries) != len(self.entries):
+            self.entries = entries
+            self.modified = True
+
+    def save(self):
+        """Write cache file atomically, if any entry was stored since loading it."""
+        if self.modified:
+            _write_json(self.filename, {'version': self.version, 'entries': self.entries})
+            self.modified = False
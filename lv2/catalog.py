@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+"""Write and read compact binary LV2 plugin catalogs with random access by URI.
+
+A catalog file holds the plugin info dicts generated by lv2-plugin-info. It can
+be memory-mapped and single plugins looked up in constant time, decoding only
+the record of that plugin.
+
+File layout (all integers little-endian):
+
+* header: magic 'LV2C', format version (u32), number of records (u32), number
+  of hash table slots (u32), offset of hash table (u64)
+* records, ordered by plugin URI: URI length (u32), data length (u32), URI
+  (UTF-8), data (zlib-compressed compact JSON of the plugin info dict)
+* hash table: slots of hash of URI (u64) and record offset (u64), offset 0
+  marks an empty slot. Collisions are resolved by linear probing.
+
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+from hashlib import blake2b
+
+
+MAGIC = b'LV2C'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIQ')
+RECORD = struct.Struct('<II')
+SLOT = struct.Struct('<QQ')
+
+
+def _hash(key):
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little')
+
+
+def write_catalog(filename, infos):
+    """Write plugin info dicts to a binary catalog file.
+
+    infos can be any iterable, e.g. the generator returned by
+    'plugin_info.iter_plugins_info', and should be ordered by URI. Only the
+    hash and offset of each record are kept in memory while writing.
+
+    """
+    tmpname = "%s.%i.tmp" % (filename, os.getpid())
+    slots = []
+
+    with open(tmpname, 'wb') as fp:
+        fp.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+
+        for info in infos:
+            key = info['uri'].encode('utf-8')
+            data = zlib.compress(
+                json.dumps(info, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+            slots.append((_hash(key), fp.tell()))
+            fp.write(RECORD.pack(len(key), len(data)))
+            fp.write(key)
+            fp.write(data)
+
+        # power of two with a load factor of at most 0.5
+        nslots = 1
+
+        while nslots < len(slots) * 2:
+            nslots *= 2
+
+        table = [(0, 0)] * nslots
+
+        for hash_, offset in slots:
+            i = hash_ % nslots
+
+            while table[i][1]:
+                i = (i + 1) % nslots
+
+            table[i] = (hash_, offset)
+
+        table_offset = fp.tell()
+        fp.write(b''.join(SLOT.pack(*slot) for slot in table))
+        fp.seek(0)
+        fp.write(HEADER.pack(MAGIC, VERSION, len(slots), nslots, table_offset))
+
+    os.replace(tmpname, filename)
+
+
+class PluginCatalog:
+    """Read-only, memory-mapped binary plugin catalog.
+
+    Behaves like a read-only mapping of plugin URIs to plugin info dicts::
+
+        with PluginCatalog('plugins.lv2c') as catalog:
+            info = catalog['http://example.org/plugin']
+
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, self._count, self._nslots, self._table = \
+                HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            magic = version = None
+
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError("'%s' is not a plugin catalog file (version %i)." %
+                             (filename, VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def _read_record(self, offset):
+        keylen, datalen = RECORD.unpack_from(self._map, offset)
+        offset += RECORD.size
+        return offset, keylen, datalen
+
+    def _decode(self, offset, keylen, datalen):
+        start = offset + keylen
+        return json.loads(zlib.decompress(self._map[start:start + datalen]))
+
+    def _find(self, uri):
+        key = uri.encode('utf-8')
+        hash_ = _hash(key)
+        i = hash_ % self._nslots if self._nslots else 0
+
+        for _ in range(self._nslots):
+            slot_hash, offset = SLOT.unpack_from(self._map, self._table + i * SLOT.size)
+
+            if not offset:
+                break
+
+            if slot_hash == hash_:
+                offset, keylen, datalen = self._read_record(offset)
+
+                if self._map[offset:offset + keylen] == key:
+                    return offset, keylen, datalen
+
+            i = (i + 1) % self._nslots
+
+        return None
+
+    def __contains__(self, uri):
+        return self._find(uri) is not None
+
+    def __getitem__(self, uri):
+        record = self._find(uri)
+
+        if record is None:
+            raise KeyError(uri)
+
+        return self._decode(*record)
+
+    def get(self, uri, default=None):
+        try:
+            return self[uri]
+        except KeyError:
+            return default
+
+    def _records(self):
+        offset = HEADER.size
+
+        for _ in range(self._count):
+            offset, keylen, datalen = self._read_record(offset)
+            yield offset, keylen, datalen
+            offset += keylen + datalen
+
+    def __iter__(self):
+        """Iterate over plugin URIs in the order they were written."""
+        for offset, keylen, _ in self._records():
+            yield self._map[offset:offset + keylen].decode('utf-8')
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        """Iterate over (URI, info) tuples, decoding one record at a time."""
+        for record in self._records():
+            offset, keylen = record[:2]
+            yield self._map[offset:offset + keylen].decode('utf-8'), self._decode(*record)
+
+    def values(self):
+        for _, info in self.items():
+            yield info
+
+    def raw_items(self):
+        """Iterate over (URI, JSON bytes) tuples without parsing the JSON.
+
+        The JSON is compact and has sorted keys, so equal info dicts give equal
+        bytes.
+
+        """
+        for offset, keylen, datalen in self._records():
+            start = offset + keylen
+            yield (self._map[offset:start].decode('utf-8'),
+                   zlib.decompress(self._map[start:start + datalen]))
+
+
+def main(args=None):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Look up plugins in a binary plugin catalog.")
+    ap.add_argument(
+        '-p', '--pretty-format',
+        action="store_true",
+        help="Pretty format JSON output")
+    ap.add_argument('catalog', help="Catalog file written by 'lv2-plugin-info --binary'")
+    ap.add_argument(
+        'plugin_uri',
+        nargs='?',
+        metavar='URI', help='Plugin URI (default: list all URIs)')
+
+    args = ap.parse_args(args)
+
+    try:
+        catalog = PluginCatalog(args.catalog)
+    except (OSError, ValueError) as exc:
+        return "error: %s" % exc
+
+    with catalog:
+        if not args.plugin_uri:
+            for uri in catalog:
+                print(uri)
+
+            return
+
+        try:
+            info = catalog[args.plugin_uri]
+        except KeyError:
+            return "error: no plugin with URI '%s' found." % args.plugin_uri
+
+    print(json.dumps(info, sort_keys=True, indent=4 if args.pretty_format else None))
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main() or 0)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""Compare two LV2 plugin catalogs written by lv2-plugin-info.
+
+Catalogs can be JSON files (a list of plugin info dicts or one dict per line)
+or binary catalog files (see catalog.py), in any combination. The differences
+are reported as JSON objects, one per line and ordered by plugin URI:
+
+    {"event": "added", "uri": "...", "plugin": {...}}
+    {"event": "removed", "uri": "..."}
+    {"event": "updated", "uri": "...", "changes": [
+        {"field": "ports.control.input[gain].ranges.maximum", "old": 1.0, "new": 2.0},
+        ...]}
+
+Both catalogs are first read as a stream to compute a hash of each plugin's
+info, keyed by URI. Only the plugins whose hashes differ are then read again
+and compared field by field, one at a time. Memory use therefore depends on
+the number of plugins, but not on the size of their info.
+
+"""
+
+import argparse
+import codecs
+import json
+import sys
+from hashlib import blake2b
+
+if __package__:
+    from .catalog import MAGIC, PluginCatalog
+else:
+    # run as a script
+    from catalog import MAGIC, PluginCatalog
+
+
+# bytes to read at once when streaming JSON catalogs
+CHUNK_SIZE = 1 << 16
+
+
+def _digest(data):
+    return blake2b(data, digest_size=16).digest()
+
+
+def _canonical(info):
+    # same serialization as used by write_catalog, so hashes are comparable
+    return json.dumps(info, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+class JSONCatalogReader:
+    """Stream plugin info dicts from a JSON list or NDJSON file."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.decoder = json.JSONDecoder()
+
+    def _iter_objects(self, fp, offset=0):
+        """Yield (byte offset, object) for each JSON object read from fp."""
+        buf = ''
+
+        while True:
+            # skip whitespace and list punctuation between the objects
+            stripped = buf.lstrip(' \t\r\n[],')
+            offset += len(buf[:len(buf) - len(stripped)].encode('utf-8'))
+            buf = stripped
+
+            try:
+                obj, end = self.decoder.raw_decode(buf) if buf else (None, 0)
+            except ValueError:
+                end = 0
+
+            if end:
+                yield offset, obj
+                offset += len(buf[:end].encode('utf-8'))
+                buf = buf[end:]
+                continue
+
+            chunk = fp.read(CHUNK_SIZE)
+
+            if not chunk:
+                if buf.strip():
+                    raise ValueError("Invalid JSON in '%s' at byte %i." %
+                                     (self.filename, offset))
+                return
+
+            buf += chunk
+
+    def scan(self):
+        """Yield (URI, digest, byte offset) for each plugin."""
+        with open(self.filename, 'rb') as fp:
+            for offset, info in self._iter_objects(_TextReader(fp)):
+                yield info['uri'], _digest(_canonical(info)), offset
+
+    def load(self, offset):
+        with open(self.filename, 'rb') as fp:
+            fp.seek(offset)
+            return next(self._iter_objects(_TextReader(fp), offset))[1]
+
+    def close(self):
+        pass
+
+
+class _TextReader:
+    """Decode UTF-8 from a binary file without newline translation.
+
+    Text files translate newlines and can only seek to positions returned by
+    tell(), which would make byte offsets of the objects unreliable.
+
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def read(self, size):
+        data = self.fp.read(size)
+        return self.decoder.decode(data, final=not data)
+
+
+class BinaryCatalogReader:
+    """Stream plugin info from a binary catalog file."""
+
+    def __init__(self, filename):
+        self.catalog = PluginCatalog(filename)
+
+    def scan(self):
+        """Yield (URI, digest, URI) for each plugin."""
+        for uri, data in self.catalog.raw_items():
+            yield uri, _digest(data), uri
+
+    def load(self, uri):
+        return self.catalog[uri]
+
+    def close(self):
+        self.catalog.close()
+
+
+def open_catalog(filename):
+    """Return reader for a JSON or binary catalog file."""
+    with open(filename, 'rb') as fp:
+        magic = fp.read(len(MAGIC))
+
+    if magic == MAGIC:
+        return BinaryCatalogReader(filename)
+
+    return JSONCatalogReader(filename)
+
+
+def _port_key(port):
+    return port.get('symbol') if isinstance(port, dict) else None
+
+
+def diff_values(old, new, field=''):
+    """Yield (field, old value, new value) for the differences between two values.
+
+    Dicts are compared key by key and lists of ports by port symbol, so that
+    changes are reported down to single port fields. Other values are compared
+    as a whole. Missing values are reported as None.
+
+    """
+    if old == new:
+        return
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in sorted(set(old) | set(new)):
+            subfield = "%s.%s" % (field, key) if field else key
+            yield from diff_values(old.get(key), new.get(key), subfield)
+    elif (isinstance(old, list) and isinstance(new, list) and field.startswith('ports.') and
+          all(_port_key(port) is not None for port in old + new)):
+        old_ports = {_port_key(port): port for port in old}
+        new_ports = {_port_key(port): port for port in new}
+
+        for symbol in sorted(set(old_ports) | set(new_ports)):
+            yield from diff_values(old_ports.get(symbol), new_ports.get(symbol),
+                                   "%s[%s]" % (field, symbol))
+    else:
+        yield field, old, new
+
+
+def diff_catalogs(old, new):
+    """Yield event dicts for the differences between two catalog readers."""
+    old_plugins = {uri: (digest, ref) for uri, digest, ref in old.scan()}
+    new_plugins = {uri: (digest, ref) for uri, digest, ref in new.scan()}
+
+    for uri in sorted(set(old_plugins) | set(new_plugins)):
+        if uri not in new_plugins:
+            yield {'event': 'removed', 'uri': uri}
+        elif uri not in old_plugins:
+            yield {'event': 'added', 'uri': uri, 'plugin': new.load(new_plugins[uri][1])}
+        elif old_plugins[uri][0] != new_plugins[uri][0]:
+            changes = [{'field': field, 'old': old_value, 'new': new_value}
+                       for field, old_value, new_value in
+                       diff_values(old.load(old_plugins[uri][1]), new.load(new_plugins[uri][1]))]
+            yield {'event': 'updated', 'uri': uri, 'changes': changes}
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument(
+        '-s', '--summary',
+        action="store_true",
+        help="Only print the number of added, removed and updated plugins")
+    ap.add_argument('old', help="Old catalog file (JSON, NDJSON or binary)")
+    ap.add_argument('new', help="New catalog file (JSON, NDJSON or binary)")
+
+    args = ap.parse_args(args)
+    readers = []
+
+    try:
+        for filename in (args.old, args.new):
+            readers.append(open_catalog(filename))
+
+        counts = dict.fromkeys(('added', 'removed', 'updated'), 0)
+
+        for event in diff_catalogs(*readers):
+            counts[event['event']] += 1
+
+            if not args.summary:
+                print(json.dumps(event, sort_keys=True), flush=True)
+
+        if args.summary:
+            print(json.dumps(counts, sort_keys=True))
+    except (OSError, ValueError, KeyError) as exc:
+        return "error: %s" % exc
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
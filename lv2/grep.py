@@ -22,6 +22,12 @@
 
 #!/usr/bin/env python
 """Print URIs of all installed LV2 plugins matching given regular expression.
+
+With --search, the pattern is a query answered from a persistent index of
+plugin meta data instead (see search.py). With --fuzzy, the best matches of
+the pattern with the plugin names and labels are printed, ranked by score.
+
+If the LV2 query daemon is running (see query_daemon.py), it answers the query.
 """
 
 import argparse
@@ -29,7 +35,111 @@ import json
 import re
 import sys
 
-import lilv
+if __package__:
+    from .plugin_index import get_indexed_uris, load_world
+    from .query_client import DaemonError, DaemonUnavailable, call
+    from .search import MATCH_MODES, SearchIndex
+else:
+    # run as a script
+    from plugin_index import get_indexed_uris, load_world
+    from query_client import DaemonError, DaemonUnavailable, call
+    from search import MATCH_MODES, SearchIndex
+
+
+def get_plugin_data(world, plugin, categories=False):
+    """Return dict with name, URI and optionally categories of a lilv plugin.
+
+    The categories are the names of the plugin's rdf:type classes ending in
+    'Plugin', without that suffix.
+
+    """
+    name = plugin.get_name()
+    plugin_data = {
+        'name': str(name) if name is not None else None,
+        'uri': str(plugin.get_uri())
+    }
+
+    if categories:
+        plugin_data['categories'] = []
+
+        for cat in plugin.get_value(world.ns.rdf.type):
+            formatted_category = re.search("#(.+)Plugin$", str(cat))
+
+            if formatted_category:
+                plugin_data['categories'].append(formatted_category.group(1))
+
+    return plugin_data
+
+
+def grep(world, pattern=None, ignore_case=False, categories=False, details=True):
+    """Return list of data dicts of the plugins in world with URIs matching pattern.
+
+    See 'get_plugin_data' for the contents of the dicts. If details is False,
+    the dicts only contain the 'uri' and the resources of the plugins are not
+    loaded.
+
+    """
+    rx = re.compile(pattern, re.I if ignore_case else 0) if pattern else None
+    results = []
+
+    for plugin in world.get_all_plugins():
+        if rx is None or rx.search(str(plugin.get_uri())):
+            if details:
+                # load all resources in bundle
+                world.load_resource(plugin.get_uri())
+                results.append(get_plugin_data(world, plugin, categories))
+            else:
+                results.append({'uri': str(plugin.get_uri())})
+
+    return results
+
+
+def search(args):
+    try:
+        if args.fuzzy:
+            matches = call('fuzzy', {'query': args.pattern or '', 'limit': args.limit})
+        else:
+            matches = [(None, record) for record in
+                       call('search', {'query': args.pattern or '', 'match': args.match,
+                                       'ignore_case': args.ignore_case})]
+    except DaemonError as exc:
+        return "error: %s" % exc
+    except DaemonUnavailable:
+        index = SearchIndex.load()
+
+        if args.fuzzy:
+            matches = index.fuzzy_search(args.pattern or '', args.limit)
+        else:
+            try:
+                matches = [(None, record) for record in
+                           index.search(args.pattern or '', args.match, args.ignore_case)]
+            except ValueError as exc:
+                return "error: %s" % exc
+
+    if not args.json:
+        for score, record in matches:
+            if score is None:
+                print(record['uri'])
+            else:
+                print("%.3f\t%s" % (score, record['uri']))
+
+        return
+
+    results = []
+
+    for score, record in matches:
+        plugin_data = {'name': record['name'], 'uri': record['uri']}
+
+        if score is not None:
+            plugin_data['score'] = round(score, 3)
+
+        if args.categories:
+            # the same plugin classes as without --search, not the category names
+            plugin_data['categories'] = record['classes']
+
+        results.append(plugin_data)
+
+    json.dump(results, sys.stdout, indent=2)
 
 
 def main(args=None):
@@ -38,48 +148,56 @@ def main(args=None):
                     help="Add list of categories for each plugin (requires -j)")
     ap.add_argument('-i', '--ignore-case', action="store_true",
                     help="Ignore case")
+    ap.add_argument('-f', '--fuzzy', action="store_true",
+                    help="Rank plugins by similarity of their name or label to pattern")
     ap.add_argument('-j', '--json', action="store_true",
                     help="Print output as list of objects in JSON format")
+    ap.add_argument('-k', '--limit', type=int, metavar='N', default=10,
+                    help="Maximum number of --fuzzy results (default: %(default)s)")
+    ap.add_argument('-m', '--match', choices=MATCH_MODES, default='substring',
+                    help="How terms of a --search query are matched (default: %(default)s)")
+    ap.add_argument('-s', '--search', action="store_true",
+                    help="Treat pattern as a search query, e.g. 'category:Reverb audio_in:2 "
+                         "hall', and answer it from the plugin index")
     ap.add_argument('pattern', nargs='?', help="LV2 plugin URI pattern")
     args = ap.parse_args(args)
 
+    if args.search or args.fuzzy:
+        return search(args)
+
     if args.pattern:
         rx = re.compile(args.pattern, re.I if args.ignore_case else 0)
 
-    world = lilv.World()
-    world.load_all()
+    try:
+        results = call('grep', {'pattern': args.pattern, 'ignore_case': args.ignore_case,
+                                'categories': args.categories, 'details': args.json})
+    except DaemonError as exc:
+        return "error: %s" % exc
+    except DaemonUnavailable:
+        results = None
 
-    results = []
-    for node in world.get_all_plugins():
-        uri = str(node.get_uri())
+    if results is None:
+        # If the plugin index is up-to-date, match against the indexed URIs and
+        # only load the bundles of the matching plugins.
+        uris = get_indexed_uris()
 
-        if not args.pattern or rx.search(uri):
-            if args.json:
-                # load all resources in bundle
-                world.load_resource(uri)
-                name = node.get_name()
-                plugin_data = {
-                    'name': str(name) if name is not None else None,
-                    'uri': uri
-                }
-
-                if args.categories:
-                    categories = []
-                    for cat in node.get_value(world.ns.rdf.type):
-                        cat = str(cat)
-                        formatted_category = re.search("#(.+)Plugin$", cat)
-                        if cat is not None:
-                            if formatted_category:
-                                categories.append(formatted_category.group(1))
-
-                    plugin_data['categories'] = categories
-
-                results.append(plugin_data)
-            else:
-                print(uri)
+        if uris is not None:
+            uris = [uri for uri in uris if not args.pattern or rx.search(uri)]
+
+            if not args.json:
+                for uri in uris:
+                    print(uri)
+
+                return
+
+        results = grep(load_world(uris), args.pattern, args.ignore_case, args.categories,
+                       args.json)
 
     if args.json:
         json.dump(results, sys.stdout, indent=2)
+    else:
+        for plugin_data in results:
+            print(plugin_data['uri'])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,473 @@
+#!/usr/bin/env python
+"""Check LV2 plugins for problems with a set of validation rules.
+
+The rules run over the plugin info dicts generated by lv2-plugin-info, so no
+bundle needs to be loaded for validation. By default, all installed plugins
+are checked, using the persistent plugin info cache, so that only plugins
+from bundles which were added, removed or modified since the last run are
+read again. Alternatively, the plugins in a JSON, NDJSON or binary catalog
+file written by lv2-plugin-info can be checked.
+
+The findings are cached too, by plugin URI together with a hash of the plugin
+info, so only plugins whose info changed are validated again. Cached findings
+are discarded when the rule selection or this module changes.
+
+Problems found while reading the RDF data of a plugin (e.g. values with the
+wrong type, which had to be replaced) are reported by the 'extraction-error'
+and 'extraction-warning' rules.
+
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from os.path import abspath
+from urllib.parse import quote
+
+if __package__:
+    from .bundles import FileCache, get_cache_file
+    from .plugin_info import iter_plugins_info, plugin_hash
+else:
+    # run as a script
+    from bundles import FileCache, get_cache_file
+    from plugin_info import iter_plugins_info, plugin_hash
+
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+Rule = namedtuple('Rule', ('id', 'level', 'description', 'fields', 'check'))
+
+# Registered rules by ID, see 'rule'
+RULES = {}
+
+
+def rule(rule_id, level, description, fields=()):
+    """Register decorated function as a validation rule.
+
+    The function is called with a plugin info dict and yields a message for
+    each problem found, or a (message, port symbol) tuple for problems of a
+    single port. The rule is skipped for plugin info dicts lacking any of the
+    given fields.
+
+    """
+    def decorator(func):
+        RULES[rule_id] = Rule(rule_id, level, description, tuple(fields), func)
+        return func
+
+    return decorator
+
+
+def _iter_ports(info):
+    # a port is listed under each of its types (e.g. atom and midi), so only
+    # yield it once
+    seen = set()
+
+    for directions in info['ports'].values():
+        for ports in directions.values():
+            for port in ports:
+                key = port['index'] if 'index' in port else ('id', id(port))
+
+                if key not in seen:
+                    seen.add(key)
+                    yield port
+
+
+@rule('extraction-error', 'error', "Errors found while reading the RDF data", ('errors',))
+def check_extraction_errors(info):
+    return info['errors']
+
+
+@rule('extraction-warning', 'warning', "Warnings found while reading the RDF data",
+      ('warnings',))
+def check_extraction_warnings(info):
+    return info['warnings']
+
+
+@rule('uri-local', 'error', "Plugin URI is a local file URI")
+def check_uri_local(info):
+    if info['uri'].startswith('file:'):
+        yield "plugin uri is local, and thus not suitable for redistribution"
+
+
+@rule('name-missing', 'error', "Plugin has no name", ('name',))
+def check_name(info):
+    if info['name'] is None:
+        yield "plugin name is missing"
+
+
+@rule('label-length', 'warning', "Plugin label is longer than 16 characters", ('label',))
+def check_label(info):
+    if info['label'] is not None and len(info['label']) > 16:
+        yield "plugin label has more than 16 characters"
+
+
+@rule('binary-missing', 'error', "Plugin has no shared library", ('binary',))
+def check_binary(info):
+    if info['binary'] is None:
+        yield "plugin binary is missing"
+
+
+@rule('brand-missing', 'warning', "Plugin has no brand", ('brand',))
+def check_brand(info):
+    if info['brand'] is None:
+        yield "plugin brand is missing"
+
+
+@rule('brand-length', 'warning', "Plugin brand is longer than 16 characters", ('brand',))
+def check_brand_length(info):
+    if info['brand'] is not None and len(info['brand']) > 16:
+        yield "plugin brand has more than 16 characters"
+
+
+@rule('license-missing', 'error', "Plugin has no license", ('license',))
+def check_license(info):
+    if info['license'] is None:
+        yield "plugin license is missing"
+
+
+@rule('comment-missing', 'error', "Plugin has no comment", ('comment',))
+def check_comment(info):
+    if info['comment'] is None:
+        yield "plugin comment is missing"
+
+
+@rule('port-name-unique', 'warning', "Port names are not unique", ('ports',))
+def check_port_names(info):
+    seen = set()
+
+    for port in _iter_ports(info):
+        name = port.get('name')
+
+        if name is None:
+            continue
+
+        if name in seen:
+            yield "port name '%s' is not unique" % name, port.get('symbol')
+
+        seen.add(name)
+
+
+@rule('port-symbol-unique', 'error', "Port symbols are not unique", ('ports',))
+def check_port_symbols(info):
+    seen = set()
+
+    for port in _iter_ports(info):
+        symbol = port.get('symbol')
+
+        if symbol is None:
+            continue
+
+        if symbol in seen:
+            yield "port symbol '%s' is not unique" % symbol, symbol
+
+        seen.add(symbol)
+
+
+@rule('port-short-name-length', 'error', "Port short name is longer than 16 characters",
+      ('ports',))
+def check_port_short_names(info):
+    for port in _iter_ports(info):
+        if len(port.get('shortName') or '') > 16:
+            yield ("port '%s' short name has more than 16 characters" % port.get('name'),
+                   port.get('symbol'))
+
+
+@rule('port-integer-cv', 'error', "CV port has the integer property", ('ports',))
+def check_port_integer_cv(info):
+    for port in info['ports'].get('cv', {}).get('input', []) + \
+            info['ports'].get('cv', {}).get('output', []):
+        if 'integer' in (port.get('properties') or ()):
+            yield ("port '%s' has integer property and CV type" % port.get('name'),
+                   port.get('symbol'))
+
+
+def select_rules(select=None, ignore=None):
+    """Return list of rules with IDs in select (default: all) and not in ignore.
+
+    Raises ValueError for unknown rule IDs.
+
+    """
+    for rule_id in (select or []) + (ignore or []):
+        if rule_id not in RULES:
+            raise ValueError("Unknown rule '%s'." % rule_id)
+
+    return [r for rule_id, r in sorted(RULES.items())
+            if (not select or rule_id in select) and rule_id not in (ignore or ())]
+
+
+def _finding(rule, info, message):
+    if isinstance(message, tuple):
+        message, port = message
+    else:
+        port = None
+
+    finding = {'rule': rule.id, 'level': rule.level, 'uri': info['uri'], 'message': message}
+
+    if port is not None:
+        finding['port'] = port
+
+    return finding
+
+
+def validate_plugin(info, rules):
+    """Return list of findings of the given rules for one plugin info dict.
+
+    Each finding is a dict with the 'rule' ID, 'level' ('error' or 'warning'),
+    plugin 'uri', 'message' and, for problems of a single port, the 'port'
+    symbol.
+
+    """
+    findings = []
+
+    for rule in rules:
+        if all(field in info for field in rule.fields):
+            findings.extend(_finding(rule, info, message) for message in rule.check(info))
+
+    return findings
+
+
+def _validate_chunk(infos, rule_ids):
+    rules = [RULES[rule_id] for rule_id in rule_ids]
+    return [validate_plugin(info, rules) for info in infos]
+
+
+def validate(infos, rules, jobs=1):
+    """Yield list of findings for each plugin info dict in infos.
+
+    With jobs > 1, the plugins are validated by that many worker processes.
+
+    """
+    if jobs <= 1:
+        for info in infos:
+            yield validate_plugin(info, rules)
+
+        return
+
+    infos = list(infos)
+    rule_ids = [r.id for r in rules]
+    chunksize = max(1, len(infos) // (jobs * 4))
+    chunks = [infos[i:i + chunksize] for i in range(0, len(infos), chunksize)]
+
+    with ProcessPoolExecutor(jobs) as executor:
+        for findings in executor.map(_validate_chunk, chunks, [rule_ids] * len(chunks)):
+            yield from findings
+
+
+def validate_cached(infos, rules, cache, jobs=1):
+    """Return list of findings lists for infos, like 'validate'.
+
+    Findings are looked up in cache, a bundles.FileCache, and only plugins
+    with no cached findings for the same plugin info hash and rules are
+    validated. Their findings are stored in the cache.
+
+    """
+    rule_ids = [r.id for r in rules]
+    # cached findings are stale when the rules are modified
+    depends = [abspath(__file__)]
+    results = []
+    missing = []
+
+    for info in infos:
+        digest = plugin_hash(info)
+        entry = cache.lookup(info['uri'], depends)
+
+        if entry and entry['hash'] == digest and entry['rules'] == rule_ids:
+            results.append(entry['findings'])
+        else:
+            missing.append((len(results), info, digest))
+            results.append(None)
+
+    checked = validate([info for _, info, _ in missing], rules, jobs)
+
+    for (i, info, digest), findings in zip(missing, checked):
+        results[i] = findings
+        cache.store(info['uri'], {'hash': digest, 'rules': rule_ids, 'findings': findings},
+                    depends)
+
+    return results
+
+
+def load_infos(filename):
+    """Return list of plugin info dicts from a JSON, NDJSON or binary catalog file."""
+    with open(filename, 'rb') as fp:
+        magic = fp.read(4)
+
+    if magic == b'LV2C':
+        if __package__:
+            from .catalog import PluginCatalog
+        else:
+            # run as a script
+            from catalog import PluginCatalog
+
+        with PluginCatalog(filename) as catalog:
+            return list(catalog.values())
+
+    with open(filename, encoding='utf-8') as fp:
+        data = fp.read()
+
+    try:
+        infos = json.loads(data)
+    except ValueError:
+        infos = [json.loads(line) for line in data.splitlines() if line.strip()]
+
+    return infos if isinstance(infos, list) else [infos]
+
+
+def to_sarif(findings, rules, infos=None):
+    """Return SARIF 2.1.0 log dict for findings of the given rules.
+
+    infos optionally maps plugin URIs to info dicts, which are used to locate
+    the bundle of each plugin.
+
+    """
+    results = []
+
+    for finding in findings:
+        name = finding['uri'] + ('#' + finding['port'] if 'port' in finding else '')
+        location = {'logicalLocations': [{'fullyQualifiedName': name}]}
+        bundles = ((infos or {}).get(finding['uri']) or {}).get('bundles')
+
+        if bundles:
+            location['physicalLocation'] = {
+                'artifactLocation': {'uri': 'file://' + quote(bundles[0]) + '/'}
+            }
+
+        results.append({
+            'ruleId': finding['rule'],
+            'level': finding['level'],
+            'message': {'text': finding['message']},
+            'locations': [location],
+        })
+
+    return {
+        'version': '2.1.0',
+        '$schema': SARIF_SCHEMA,
+        'runs': [{
+            'tool': {
+                'driver': {
+                    'name': 'lv2-lint',
+                    'rules': [{
+                        'id': r.id,
+                        'shortDescription': {'text': r.description},
+                        'defaultConfiguration': {'level': r.level},
+                    } for r in rules],
+                }
+            },
+            'results': results,
+        }],
+    }
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument(
+        '--cache-file',
+        metavar='PATH',
+        help="Plugin info cache file (default: "
+             "$XDG_CACHE_HOME/calvo-cli-tools/lv2-plugin-info.json)")
+    ap.add_argument(
+        '--no-cache',
+        action="store_true",
+        help="Validate all plugins instead of reusing the cached findings of unchanged "
+             "plugins")
+    ap.add_argument(
+        '-f', '--format',
+        choices=('text', 'json', 'sarif'),
+        default='text',
+        help="Output format (default: %(default)s)")
+    ap.add_argument(
+        '-i', '--input',
+        metavar='FILE',
+        help="Check plugins in a JSON, NDJSON or binary catalog file written by "
+             "lv2-plugin-info instead of the installed plugins")
+    ap.add_argument(
+        '-j', '--jobs',
+        type=int,
+        metavar='N',
+        default=1,
+        help="Number of worker processes to use, 0 for one per CPU (default: %(default)s)")
+    ap.add_argument(
+        '-l', '--list-rules',
+        action="store_true",
+        help="List available rules and exit")
+    ap.add_argument(
+        '-s', '--select',
+        metavar='LIST',
+        help="Comma-separated list of rule IDs to check (default: all)")
+    ap.add_argument(
+        '--ignore',
+        metavar='LIST',
+        help="Comma-separated list of rule IDs not to check")
+    ap.add_argument(
+        'plugin_uri',
+        nargs='*',
+        metavar='URI',
+        help="Only check plugins with these URIs")
+
+    args = ap.parse_args(args)
+
+    if args.list_rules:
+        for r in sorted(RULES.values()):
+            print("%-24s %-8s %s" % (r.id, r.level, r.description))
+
+        return
+
+    try:
+        rules = select_rules(args.select.split(',') if args.select else None,
+                             args.ignore.split(',') if args.ignore else None)
+    except ValueError as exc:
+        return "error: %s" % exc
+
+    jobs = args.jobs or os.cpu_count() or 1
+
+    if args.input:
+        try:
+            infos = load_infos(args.input)
+        except (OSError, ValueError) as exc:
+            return "error: %s" % exc
+    else:
+        infos = list(iter_plugins_info(cache=True, cache_file=args.cache_file, jobs=jobs))
+
+    if args.plugin_uri:
+        uris = set(args.plugin_uri)
+        infos = [info for info in infos if info['uri'] in uris]
+
+    if args.no_cache:
+        results = validate(infos, rules, jobs)
+    else:
+        cache = FileCache(get_cache_file('lv2-lint.json'))
+        results = validate_cached(infos, rules, cache, jobs)
+
+        if not args.input and not args.plugin_uri:
+            # forget uninstalled plugins
+            cache.prune(info['uri'] for info in infos)
+
+        try:
+            cache.save()
+        except OSError as exc:
+            print("Could not write cache file '%s': %s" % (cache.filename, exc),
+                  file=sys.stderr)
+
+    findings = [finding for plugin_findings in results for finding in plugin_findings]
+
+    if args.format == 'sarif':
+        sarif = to_sarif(findings, rules, {info['uri']: info for info in infos})
+        json.dump(sarif, sys.stdout, indent=2, sort_keys=True)
+        print()
+    elif args.format == 'json':
+        json.dump(findings, sys.stdout, indent=2, sort_keys=True)
+        print()
+    else:
+        for finding in findings:
+            port = " (port '%s')" % finding['port'] if 'port' in finding else ''
+            print("%s%s: %s: %s [%s]" % (finding['uri'], port, finding['level'],
+                                         finding['message'], finding['rule']))
+
+    return 1 if any(f['level'] == 'error' for f in findings) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
@@ -22,60 +22,295 @@
 
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-"""List all presets of an LV2 plugin with the given URI."""
+"""List all presets of the LV2 plugins with the given URIs.
 
+All plugins are looked up in the same lilv world and each preset file is
+loaded only once, even if it holds the presets of several plugins. With
+--json, the presets of each plugin are printed as soon as they are read, as a
+JSON object on a separate line:
+
+    {"uri": "<plugin URI>", "presets": [{"label": "...", "uri": "..."}, ...]}
+
+With --contents, each preset also lists its control port values by port
+symbol ("ports") and its state properties ("state"). The contents are cached
+per preset and only read again when one of the preset's files changed.
+
+"""
+
+import argparse
+import json
 import sys
 import lilv
 
+if __package__:
+    from .bundles import FileCache, get_cache_file
+    from .plugin_index import load_world
+    from .query_client import DaemonError, DaemonUnavailable, call
+else:
+    # run as a script
+    from bundles import FileCache, get_cache_file
+    from plugin_index import load_world
+    from query_client import DaemonError, DaemonUnavailable, call
+
 
+NS_PATCH = 'http://lv2plug.in/ns/ext/patch#'
 NS_PRESETS = 'http://lv2plug.in/ns/ext/presets#'
+NS_STATE = 'http://lv2plug.in/ns/ext/state#'
+
+# Increment when the structure of the preset contents changes
+CACHE_VERSION = 1
+
+
+def _load_preset(world, preset, loaded):
+    """Load the files describing preset, unless already loaded, and return them."""
+    files = frozenset(str(node)
+                      for node in world.find_nodes(preset, world.ns.rdfs.seeAlso, None))
+
+    if not files or not files <= loaded:
+        world.load_resource(preset)
+        loaded.update(files)
+
+    return files
+
+
+def _get_label(world, preset):
+    labels = world.find_nodes(preset, world.ns.rdfs.label, None)
+    return str(labels[0]) if labels else None
+
+
+def node2value(node):
+    """Return value of lilv.Node as int, float, bool or string."""
+    if node.is_int():
+        return int(node)
+    elif node.is_float():
+        return float(node)
+    elif node.is_bool():
+        return bool(node)
+
+    return str(node)
+
+
+def get_presets(world, plugin, loaded=None):
+    """Return list of (label, URI) tuples of the presets of plugin.
 
+    loaded is an optional set of the preset files already loaded into world.
+    It is updated with the files loaded by this call, so the presets of
+    further plugins sharing these files can be listed without loading them
+    again.
 
-def get_presets(world, plugin):
+    """
     ns_presets = lilv.Namespace(world, NS_PRESETS)
     presets = plugin.get_related(ns_presets.Preset)
     preset_list = []
 
+    if loaded is None:
+        loaded = set()
+
     for preset in presets:
-        world.load_resource(preset)
-        labels = world.find_nodes(preset, world.ns.rdfs.label, None)
+        _load_preset(world, preset, loaded)
+        preset_list.append((_get_label(world, preset), str(preset)))
 
-        if labels:
-            label = str(labels[0])
-        else:
-            label = None
+    return preset_list
+
+
+def _get_contents(world, preset, state_keys):
+    ns = world.ns
+    ns_presets = lilv.Namespace(world, NS_PRESETS)
+    ports = {}
+    state = {}
+
+    for port in world.find_nodes(preset, ns.lv2.port, None):
+        symbol = world.find_nodes(port, ns.lv2.symbol, None)
+        value = world.find_nodes(port, ns_presets.value, None)
+
+        if symbol and value:
+            ports[str(symbol[0])] = node2value(value[0])
+
+    for node in world.find_nodes(preset, lilv.Namespace(world, NS_STATE).state, None):
+        for key in state_keys:
+            value = world.find_nodes(node, key, None)
+
+            if value:
+                state[str(key)] = node2value(value[0])
+
+    return {'label': _get_label(world, preset), 'uri': str(preset),
+            'ports': ports, 'state': state}
+
+
+def get_preset_contents(world, plugin, loaded=None, cache=None):
+    """Return list of dicts with label, URI, port values and state of each preset of plugin.
+
+    'ports' maps control port symbols to their value, 'state' maps state keys
+    to their value. Since the lilv bindings can only look up known
+    predicates, state keys are limited to the parameters the plugin declares
+    as patch:readable or patch:writable.
+
+    If cache is a FileCache, the contents of presets are returned from it
+    without loading their files, if neither these nor the files describing the
+    plugin (which declare the state keys) changed since they were stored. See
+    'get_presets' for loaded.
+
+    """
+    ns_patch = lilv.Namespace(world, NS_PATCH)
+    ns_presets = lilv.Namespace(world, NS_PRESETS)
+    state_keys = None
+    plugin_files = [node.get_path() for node in plugin.get_data_uris()]
+    preset_list = []
+
+    if loaded is None:
+        loaded = set()
+
+    for preset in plugin.get_related(ns_presets.Preset):
+        uri = str(preset)
+        files = plugin_files + [node.get_path() for node in
+                                world.find_nodes(preset, world.ns.rdfs.seeAlso, None)]
+        contents = cache.lookup(uri, files) if cache is not None else None
+
+        if contents is None:
+            if state_keys is None:
+                plugin_uri = plugin.get_uri()
+                state_keys = (list(world.find_nodes(plugin_uri, ns_patch.readable, None)) +
+                              list(world.find_nodes(plugin_uri, ns_patch.writable, None)))
 
-        preset_list.append((label, str(preset)))
+            _load_preset(world, preset, loaded)
+            contents = _get_contents(world, preset, state_keys)
+
+            if cache is not None:
+                cache.store(uri, contents, files)
+
+        preset_list.append(contents)
 
     return preset_list
 
 
-def main(args=None):
-    args = sys.argv[1:] if args is None else args
+def iter_plugin_presets(world, uris=None, contents=False, cache=None, loaded=None):
+    """Yield a dict with the presets of each plugin with given URI ordered by label.
 
-    if args:
-        uri = args[0]
-    else:
-        return "Usage: lv2_list_plugin_presets <plugin URI>"
+    If uris is None, the presets of all plugins in world are listed. Each dict
+    has the plugin 'uri' and a list of 'presets' as returned by 'get_presets'
+    or, with contents, 'get_preset_contents', or an 'error' message, if the
+    plugin was not found. See 'get_presets' for loaded.
 
-    world = lilv.World()
-    world.load_all()
+    """
     plugins = world.get_all_plugins()
 
-    try:
-        plugin = plugins[uri]
-    except KeyError as exc:
-        return "error: no plugin with URI '%s' found." % uri
-    except ValueError as exc:
-        return "error: %s" % exc
+    if loaded is None:
+        loaded = set()
+
+    if uris is None:
+        uris = sorted(str(plugin.get_uri()) for plugin in plugins)
+
+    for uri in uris:
+        try:
+            plugin = plugins[uri]
+        except KeyError:
+            yield {'uri': uri, 'error': "no plugin with URI '%s' found." % uri}
+            continue
+        except ValueError as exc:
+            yield {'uri': uri, 'error': str(exc)}
+            continue
+
+        if contents:
+            presets = get_preset_contents(world, plugin, loaded, cache)
+        else:
+            presets = [{'label': label, 'uri': preset_uri}
+                       for label, preset_uri in get_presets(world, plugin, loaded)]
+
+        presets.sort(key=lambda x: x['label'] or '')
+        yield {'uri': uri, 'presets': presets}
+
+
+def get_contents_cache(cache_file=None):
+    return FileCache(cache_file or get_cache_file('lv2-preset-contents.json'),
+                     version=CACHE_VERSION)
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('-a', '--all', action="store_true",
+                    help="List presets of all installed plugins")
+    ap.add_argument('-c', '--contents', action="store_true",
+                    help="Also list port values and state of each preset")
+    ap.add_argument('--cache-file', metavar='FILE',
+                    help="Preset contents cache file (default: "
+                         "$XDG_CACHE_HOME/calvo-cli-tools/lv2-preset-contents.json)")
+    ap.add_argument('-j', '--json', action="store_true",
+                    help="Print presets of each plugin as a JSON object on a separate line")
+    ap.add_argument('plugin_uri', nargs='*', metavar='URI',
+                    help="Plugin URI ('-' reads URIs from standard input, one per line)")
+    args = ap.parse_args(args)
+
+    uris = []
+
+    for uri in args.plugin_uri:
+        if uri == '-':
+            uris.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            uris.append(uri)
+
+    if not uris and not args.all:
+        ap.print_usage(sys.stderr)
+        return "error: no plugin URI given."
+
+    cache = None
+    results = None
+    missing = False
+
+    # the daemon uses the default cache file
+    if not args.cache_file:
+        try:
+            results = call('presets', {'uris': None if args.all else uris,
+                                       'contents': args.contents})
+        except DaemonError as exc:
+            return "error: %s" % exc
+        except DaemonUnavailable:
+            pass
+
+    if results is None:
+        if args.contents:
+            cache = get_contents_cache(args.cache_file)
+
+        results = iter_plugin_presets(load_world(None if args.all else uris),
+                                      None if args.all else uris, args.contents, cache)
+
+    for result in results:
+        uri = result['uri']
+
+        if 'error' in result:
+            print("error: %s" % result['error'], file=sys.stderr)
+            missing = True
+            continue
+
+        if args.json:
+            print(json.dumps(result), flush=True)
+            continue
+
+        if args.all or len(uris) > 1:
+            print("Plugin: %s\n" % uri)
+
+        for preset in result['presets']:
+            if preset['label'] is None:
+                print("Preset '%s' has no rdfs:label" % preset['uri'], file=sys.stderr)
+
+            print("Label: %s" % (preset['label'] or ""))
+            print("URI: %s" % preset['uri'])
+
+            for symbol, value in sorted(preset.get('ports', {}).items()):
+                print("Port: %s = %s" % (symbol, value))
+
+            for key, value in sorted(preset.get('state', {}).items()):
+                print("State: %s = %s" % (key, value))
+
+            print()
 
-    presets = get_presets(world, plugin)
-    for label, preset_uri in sorted(presets, key=lambda x: x[0] or ''):
-        if label is None:
-            print("Preset '%s' has no rdfs:label" % preset, file=sys.stderr)
+    if cache is not None:
+        try:
+            cache.save()
+        except OSError as exc:
+            print("Could not write cache file '%s': %s" % (cache.filename, exc),
+                  file=sys.stderr)
 
-        print("Label: %s" % label or "")
-        print("URI: %s\n" % preset_uri)
+    return 1 if missing else 0
 
 
 if __name__ == '__main__':
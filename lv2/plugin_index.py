@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""Index of installed LV2 plugins mapping plugin URIs to the bundles they use.
+
+The index allows to load only the bundles needed for a query about a few
+plugins into a lilv.World, instead of loading all installed bundles.
+
+"""
+
+import os
+from os.path import dirname, realpath
+
+import lilv
+
+if __package__:
+    from .bundles import BundleCache, get_cache_file, uri_to_bundle
+else:
+    # run as a script
+    from bundles import BundleCache, get_cache_file, uri_to_bundle
+
+
+NS_PRESETS = 'http://lv2plug.in/ns/ext/presets#'
+
+# Increment when the structure of the index entries changes
+INDEX_VERSION = 1
+
+
+def get_index(index_file=None):
+    """Return BundleCache instance holding the plugin URI to bundles index."""
+    return BundleCache(index_file or get_cache_file('lv2-plugin-index.json'),
+                       version=INDEX_VERSION)
+
+
+def get_plugin_bundles(world, plugin):
+    """Return set of real paths of all bundles with data for or presets of plugin."""
+    bundles = {realpath(plugin.get_bundle_uri().get_path())}
+    bundles.update(realpath(dirname(node.get_path().rstrip(os.sep)))
+                   for node in plugin.get_data_uris())
+
+    for preset in plugin.get_related(lilv.Namespace(world, NS_PRESETS).Preset):
+        bundle = uri_to_bundle(str(preset))
+
+        if bundle:
+            bundles.add(bundle)
+
+    return bundles
+
+
+def update_index(world, index):
+    """Rebuild index from world with all bundles loaded and save it."""
+    index.clear()
+
+    for plugin in world.get_all_plugins():
+        bundles = get_plugin_bundles(world, plugin)
+        index.store(str(plugin.get_uri()), sorted(bundles), bundles)
+
+    try:
+        index.save()
+    except OSError:
+        # the index is an optimization, failing to write it is not an error
+        pass
+
+
+def get_indexed_uris(index_file=None):
+    """Return sorted list of all plugin URIs or None if the index is out of date."""
+    index = get_index(index_file)
+
+    if index.valid:
+        return sorted(index.entries)
+
+
+def get_shared_bundles(index):
+    """Return set of installed bundles, which provide no data for any indexed plugin.
+
+    These are mostly the LV2 specification bundles, which define e.g. the
+    plugin classes, units and parameters plugins refer to.
+
+    """
+    shared = set(index.bundles)
+
+    for entry in index.entries.values():
+        shared.difference_update(entry['data'])
+
+    return shared
+
+
+def load_world(uris=None, index_file=None):
+    """Return a new lilv.World with the bundles of the given plugin URIs loaded.
+
+    The shared bundles (see 'get_shared_bundles') are loaded too, like by
+    World.load_all, so queries give the same result as with all bundles
+    loaded. If uris is None, or any of the URIs is not found in the index or
+    the bundles it refers to have changed, all bundles are loaded and the index
+    is rebuilt, if it is out of date.
+
+    """
+    world = lilv.World()
+    index = get_index(index_file)
+
+    # bundles which are new since the index was built may provide data for
+    # any plugin, so only use the index if there are none
+    if uris is not None and not index.unclaimed():
+        bundles = set()
+
+        for uri in uris:
+            plugin_bundles = index.lookup(uri)
+
+            if plugin_bundles is None:
+                break
+
+            bundles.update(plugin_bundles)
+        else:
+            for bundle in sorted(bundles | get_shared_bundles(index)):
+                world.load_bundle(world.new_file_uri(None, bundle + os.sep))
+
+            world.load_specifications()
+            world.load_plugin_classes()
+            return world
+
+    world.load_all()
+
+    if not index.valid:
+        update_index(world, index)
+
+    return world
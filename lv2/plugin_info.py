@@ -23,12 +23,27 @@
 
 """Generate JSON document with information about a single or all installed LV2 plugins."""
 
+import json
 import os
-from math import fmod
-from os.path import dirname
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+from os.path import dirname, realpath
+from time import perf_counter
+from types import SimpleNamespace
 
 import lilv
 
+if __package__:
+    from .bundles import BundleCache, bundle_hash, get_cache_file, uri_to_bundle
+    from .plugin_index import load_world
+    from .query_client import DaemonError, DaemonUnavailable, call
+else:
+    # run as a script
+    from bundles import BundleCache, bundle_hash, get_cache_file, uri_to_bundle
+    from plugin_index import load_world
+    from query_client import DaemonError, DaemonUnavailable, call
+
 
 NS_MOD = "http://moddevices.com/ns/mod#"
 NS_PATCH = 'http://lv2plug.in/ns/ext/patch#'
@@ -103,6 +118,20 @@ LV2_UNITS = units = {
     's': ("seconds", "%f s", "s"),
 }
 
+# Increment when the structure of the plugin info dicts changes
+CACHE_VERSION = 4
+
+PLUGIN_FIELDS = (
+    'author', 'binary', 'brand', 'bundles', 'category', 'classes', 'comment', 'errors',
+    'label', 'license', 'microVersion', 'minorVersion', 'name', 'ports',
+    'presets', 'properties', 'stability', 'uri', 'version', 'warnings',
+)
+
+PORT_FIELDS = (
+    'comment', 'designation', 'index', 'name', 'properties', 'rangeSteps',
+    'ranges', 'scalePoints', 'shortName', 'symbol', 'units',
+)
+
 
 def node2str(node, strip=True):
     """Return lilv.Node to string.
@@ -142,12 +171,219 @@ def getfirst(obj, uri, strip=True):
         return None
 
 
+def parse_fields(fields):
+    """Return tuple of plugin and port field sets selected by list of field names.
+
+    Port fields are given as 'ports.<field>'. Selecting a port field implies
+    selecting 'ports'. If only 'ports' is selected, all port fields are
+    included and the returned port field set is None. If fields is None, all
+    fields are selected and (None, None) is returned.
+
+    Raises ValueError for unknown field names.
+
+    """
+    if fields is None:
+        return None, None
+
+    plugin_fields = {'uri'}
+    port_fields = set()
+
+    for field in fields:
+        field = field.strip()
+
+        if field.startswith('ports.'):
+            field = field[6:]
+
+            if field not in PORT_FIELDS:
+                raise ValueError("Unknown port field '%s'." % field)
+
+            port_fields.add(field)
+            plugin_fields.add('ports')
+        elif field in PLUGIN_FIELDS:
+            plugin_fields.add(field)
+        elif field:
+            raise ValueError("Unknown field '%s'." % field)
+
+    return plugin_fields, port_fields or None
+
+
+def project_plugin_info(info, fields):
+    """Return copy of plugin info dict reduced to the given fields.
+
+    See 'parse_fields' for the format of fields.
+
+    """
+    plugin_fields, port_fields = parse_fields(fields)
+
+    if plugin_fields is None:
+        return info
+
+    # keys starting with an underscore hold diagnostics, e.g. '_timings'
+    info = {key: value for key, value in info.items()
+            if key in plugin_fields or key.startswith('_')}
+
+    if port_fields is not None and 'ports' in info:
+        info['ports'] = {
+            typ: {
+                direction: [{key: value for key, value in port.items() if key in port_fields}
+                            for port in ports]
+                for direction, ports in directions.items()
+            }
+            for typ, directions in info['ports'].items()
+        }
+
+    return info
+
+
+def _intern_nodes(world):
+    """Return table of the lilv.Node instances used as predicates during extraction.
+
+    Each access to 'world.ns.<prefix>.<name>' creates a new node, so the
+    extractors use this table instead, which is created once per World.
+
+    """
+    ns = world.ns
+    mod = lilv.Namespace(world, NS_MOD)
+    patch = lilv.Namespace(world, NS_PATCH)
+    pprops = lilv.Namespace(world, NS_PORT_PROPERTIES)
+    presets = lilv.Namespace(world, NS_PRESET)
+    units = lilv.Namespace(world, NS_UNITS)
+
+    return SimpleNamespace(
+        atom_bufferType=ns.atom.bufferType,
+        atom_Sequence=ns.atom.Sequence,
+        doap_license=ns.doap.license,
+        lv2_designation=ns.lv2.designation,
+        lv2_latency=str(ns.lv2.latency),
+        lv2_microVersion=ns.lv2.microVersion,
+        lv2_minorVersion=ns.lv2.minorVersion,
+        lv2_Parameter=ns.lv2.Parameter,
+        lv2_portProperty=ns.lv2.portProperty,
+        lv2_shortName=ns.lv2.shortName,
+        lv2_shortname=ns.lv2.shortname,
+        midi_MidiEvent=ns.midi.MidiEvent,
+        mod_brand=mod.brand,
+        mod_label=mod.label,
+        mod_rangeSteps=mod.rangeSteps,
+        patch_readable=patch.readable,
+        patch_writable=patch.writable,
+        pprops_rangeSteps=pprops.rangeSteps,
+        presets_Preset=presets.Preset,
+        rdf_type=ns.rdf.type,
+        rdfs_comment=ns.rdfs.comment,
+        rdfs_label=ns.rdfs.label,
+        rdfs_range=ns.rdfs.range,
+        units_render=units.render,
+        units_symbol=units.symbol,
+        units_unit=units.unit,
+    )
+
+
+def _fragment(ctx, node):
+    """Return the part of the URI of node after the last '#'.
+
+    Results are memoized per context, since the same few type and property
+    URIs occur on most ports.
+
+    """
+    uri = str(node)
+
+    try:
+        return ctx.fragments[uri]
+    except KeyError:
+        fragment = ctx.fragments[uri] = uri.rsplit('#', 1)[-1]
+        return fragment
+
+
+def _coerce_value(node, is_int):
+    """Return value of a numeric lilv.Node as int or float and the kind of coercion.
+
+    The kind is None if the node has the expected type, 'float' or 'decimals'
+    if a float (without or with decimals) was truncated to an int and
+    'integer' if an int was converted to a float.
+
+    """
+    if node.is_int():
+        return (int(node), None) if is_int else (int(node) * 1.0, 'integer')
+
+    value = float(node)
+
+    if not is_int:
+        return value, None
+
+    return int(value), 'float' if value.is_integer() else 'decimals'
+
+
+def _report_coercion(ctx, kind, portname, what):
+    if kind == 'float':
+        ctx.warnings.append(
+            "port '%s' has integer property but %s value is float" % (portname, what))
+    elif kind == 'decimals':
+        ctx.errors.append(
+            "port '%s' has integer property but %s value has non-zero decimals" % (portname, what))
+    elif kind == 'integer':
+        ctx.warnings.append("port '%s' %s value is an integer" % (portname, what))
+
+
+def _normalize_scale_points(ctx, portname, is_int, ranges, scalepoints):
+    """Return list of scale point dicts of a port sorted by value.
+
+    The values of all scale points are coerced, checked against the port range
+    and collected in a single pass and then sorted once.
+
+    """
+    errors = ctx.errors
+    minimum = ranges['minimum']
+    maximum = ranges['maximum']
+    label_by_value = {}
+    values = []
+
+    for sp in scalepoints:
+        label = sp.get_label()
+        node = sp.get_value()
+
+        if label is None:
+            errors.append("a port scalepoint is missing its label")
+            continue
+
+        label = str(label).strip()
+
+        if node is None:
+            errors.append("port scalepoint '%s' is missing its value" % label)
+            continue
+
+        # inlined _coerce_value, since this is the hot loop for big enumerations
+        if node.is_int():
+            value = int(node)
+
+            if not is_int:
+                value *= 1.0
+                _report_coercion(ctx, 'integer', portname, "scalepoint '%s'" % label)
+        else:
+            value = float(node)
+
+            if is_int:
+                _report_coercion(ctx, 'float' if value.is_integer() else 'decimals', portname,
+                                 "scalepoint '%s'" % label)
+                value = int(value)
+
+        if minimum <= value <= maximum:
+            # for equal values, the label of the last scale point is used
+            label_by_value[value] = label
+            values.append(value)
+        else:
+            errors.append(("port scalepoint '%s' has an out-of-bounds value:\n" % label) +
+                          ("%d < %d < %d" if is_int else "%f < %f < %f") % (minimum, value, maximum))
+
+    values.sort()
+    return [{'value': value, 'label': label_by_value[value]} for value in values]
+
+
 def _get_port_info(ctx, port):
     world = ctx.world
-    warnings = ctx.warnings
+    nodes = ctx.nodes
     errors = ctx.errors
-    portnames = ctx.portnames
-    portsymbols = ctx.portsymbols
+    want = ctx.port_fields
 
     # base data
     portname = port.get_name()
@@ -166,111 +402,59 @@ def _get_port_info(ctx, port):
     else:
         portsymbol = str(portsymbol)
 
-    # check for duplicate names
-    if portname in portsymbols:
-        warnings.append("port name '%s' is not unique" % portname)
-    else:
-        portnames.add(portname)
-
-    # check for duplicate symbols
-    if portsymbol in portsymbols:
-        errors.append("port symbol '%s' is not unique" % portsymbol)
-    else:
-        portsymbols.add(portsymbol)
-
     # short name
-    psname = getfirst(port, world.ns.lv2.shortName)
+    psname = None
+
+    if want is None or 'shortName' in want:
+        psname = getfirst(port, nodes.lv2_shortName)
 
-    if psname is None:
-        psname = portname[:16]
-    elif len(psname) > 16:
-        errors.append(
-            "port '%s' short name has more than 16 characters" % portname)
+        if psname is None:
+            psname = portname[:16]
 
-    # check for old style shortName
-    if port.get_value(world.ns.lv2.shortname):
-        errors.append(
-            "port '%s' short name is using old style 'shortname' instead of 'shortName'" % portname)
+        # check for old style shortName
+        if port.get_value(nodes.lv2_shortname):
+            errors.append(
+                "port '%s' short name is using old style 'shortname' instead of 'shortName'" % portname)
 
     # port types
-    types = [str(t).rsplit("#", 1)[-1][:-4]
-             for t in port.get_value(world.ns.rdf.type)]
-    buffer_type = port.get_value(world.ns.atom.bufferType)
+    types = [_fragment(ctx, t)[:-4] for t in port.get_value(nodes.rdf_type)]
+    buffer_type = port.get_value(nodes.atom_bufferType)
 
-    if ("Atom" in types and port.supports_event(world.ns.midi.MidiEvent) and buffer_type
-            and str(buffer_type[0]) == world.ns.atom.Sequence):
+    if ("Atom" in types and port.supports_event(nodes.midi_MidiEvent) and buffer_type
+            and buffer_type[0] == nodes.atom_Sequence):
         types.append("MIDI")
 
     # port comment
-    pcomment = getfirst(port, world.ns.rdfs.comment)
+    pcomment = getfirst(port, nodes.rdfs_comment)
 
     # port designation
-    designation = getfirst(port, world.ns.lv2.designation)
+    designation = getfirst(port, nodes.lv2_designation)
 
     # port rangeSteps
-    rangesteps = getfirst(port, world.ns.mod.rangeSteps) or getfirst(
-        port, world.ns.pprops.rangeSteps)
+    rangesteps = getfirst(port, nodes.mod_rangeSteps) or getfirst(
+        port, nodes.pprops_rangeSteps)
 
     # port properties
-    properties = sorted([str(t).rsplit("#", 1)[-1]
-                         for t in port.get_value(world.ns.lv2.portProperty)])
+    properties = sorted([_fragment(ctx, t)
+                         for t in port.get_value(nodes.lv2_portProperty)])
 
     # data
     ranges = {}
     scalepoints = []
 
     # control and cv must contain ranges, might contain scale points
-    if "Control" in types or "CV" in types:
+    # (properties depend on them too, because an enumeration needs scale points)
+    if (("Control" in types or "CV" in types) and
+            (want is None or not want.isdisjoint(('ranges', 'scalePoints', 'properties')))):
         is_int = "integer" in properties
 
-        if is_int and "CV" in types:
-            errors.append(
-                "port '%s' has integer property and CV type" % portname)
-
         xdefault, xminimum, xmaximum = port.get_range()
 
         if xminimum is not None and xmaximum is not None:
-            if is_int:
-                if xminimum.is_int():
-                    ranges['minimum'] = int(xminimum)
-                else:
-                    ranges['minimum'] = float(xminimum)
-                    if fmod(ranges['minimum'], 1.0) == 0.0:
-                        warnings.append(
-                            "port '%s' has integer property but minimum value is float" % portname)
-                    else:
-                        errors.append(
-                            "port '%s' has integer property but minimum value has non-zero decimals" % portname)
-
-                    ranges['minimum'] = int(ranges['minimum'])
-
-                if xmaximum.is_int():
-                    ranges['maximum'] = int(xmaximum)
-                else:
-                    ranges['maximum'] = float(xmaximum)
-                    if fmod(ranges['maximum'], 1.0) == 0.0:
-                        warnings.append(
-                            "port '%s' has integer property but maximum value is float" % portname)
-                    else:
-                        errors.append(
-                            "port '%s' has integer property but maximum value has non-zero decimals" % portname)
-
-                    ranges['maximum'] = int(ranges['maximum'])
-
-            else:
-                if xminimum.is_int():
-                    warnings.append(
-                        "port '%s' minimum value is an integer" % portname)
-                    ranges['minimum'] = int(xminimum) * 1.0
-                else:
-                    ranges['minimum'] = float(xminimum)
-
-                if xmaximum.is_int():
-                    warnings.append(
-                        "port '%s' maximum value is an integer" % portname)
-                    ranges['maximum'] = int(xmaximum) * 1.0
-                else:
-                    ranges['maximum'] = float(xmaximum)
+            ranges['minimum'], kind = _coerce_value(xminimum, is_int)
+            _report_coercion(ctx, kind, portname, "minimum")
+            ranges['maximum'], kind = _coerce_value(xmaximum, is_int)
+            _report_coercion(ctx, kind, portname, "maximum")
 
             if ranges['minimum'] >= ranges['maximum']:
                 ranges['maximum'] = ranges['minimum'] + (1 if is_int else 0.1)
@@ -278,26 +462,8 @@ def _get_port_info(ctx, port):
                     "port '%s' minimum value is equal or higher than its maximum" % portname)
 
             if xdefault is not None:
-                if is_int:
-                    if xdefault.is_int():
-                        ranges['default'] = int(xdefault)
-                    else:
-                        ranges['default'] = float(xdefault)
-                        if fmod(ranges['default'], 1.0) == 0.0:
-                            warnings.append(
-                                "port '%s' has integer property but default value is float" % portname)
-                        else:
-                            errors.append(
-                                "port '%s' has integer property but default value has non-zero decimals" % portname)
-                        ranges['default'] = int(ranges['default'])
-                else:
-                    if xdefault.is_int():
-                        warnings.append(
-                            "port '%s' default value is an integer" % portname)
-                        ranges['default'] = int(xdefault) * 1.0
-                    else:
-                        ranges['default'] = float(xdefault)
-
+                ranges['default'], kind = _coerce_value(xdefault, is_int)
+                _report_coercion(ctx, kind, portname, "default")
                 testmin = ranges['minimum']
                 testmax = ranges['maximum']
 
@@ -327,77 +493,31 @@ def _get_port_info(ctx, port):
                 ranges['maximum'] = 1.0
                 ranges['default'] = 0.0
 
-            if "CV" not in types and designation != str(world.ns.lv2.latency):
+            if "CV" not in types and designation != nodes.lv2_latency:
                 errors.append("port '%s' is missing value ranges" % portname)
 
         scalepoints = port.get_scale_points()
 
         if scalepoints is not None:
-            scalepoints_unsorted = []
-
-            for sp in scalepoints:
-                label = node2str(sp.get_label())
-                value = sp.get_value()
+            scalepoints = _normalize_scale_points(ctx, portname, is_int, ranges, scalepoints)
 
-                if label is None:
-                    errors.append("a port scalepoint is missing its label")
-                    continue
-
-                if value is None:
-                    errors.append(
-                        "port scalepoint '%s' is missing its value" % label)
-                    continue
-
-                if is_int:
-                    if value.is_int():
-                        value = int(value)
-                    else:
-                        value = float(value)
-                        if fmod(value, 1.0) == 0.0:
-                            warnings.append(
-                                "port '%s' has integer property but scalepoint '%s' value is float" % (portname, label))
-                        else:
-                            errors.append(
-                                "port '%s' has integer property but scalepoint '%s' value has non-zero decimals" % (portname, label))
-                        value = int(value)
-                else:
-                    if value.is_int():
-                        warnings.append(
-                            "port '%s' scalepoint '%s' value is an integer" % (portname, label))
-                        value = int(value) * 1.0
-                    else:
-                        value = float(value)
-
-                if ranges['minimum'] <= value <= ranges['maximum']:
-                    scalepoints_unsorted.append((value, label))
-                else:
-                    errors.append(("port scalepoint '%s' has an out-of-bounds value:\n" % label) +
-                                  ("%d < %d < %d" if is_int else "%f < %f < %f") % (ranges['minimum'], value, ranges['maximum']))
-
-            if scalepoints_unsorted:
-                unsorted = dict(s for s in scalepoints_unsorted)
-                values = list(s[0] for s in scalepoints_unsorted)
-                values.sort()
-                scalepoints = list(
-                    {'value': v, 'label': unsorted[v]} for v in values)
-
-        if "enumeration" in properties and len(scalepoints) <= 1:
+        if "enumeration" in properties and len(scalepoints or ()) <= 1:
             errors.append(
                 "port '%s' wants to use enumeration but doesn't have enough values" % portname)
             properties.remove("enumeration")
 
     # control ports might contain unit
     units = {}
-    if "Control" in types:
+    if "Control" in types and (want is None or 'units' in want):
         # unit
-        uunit = port.get_value(world.ns.units.unit)
+        uunit = port.get_value(nodes.units_unit)
         ulabel = urender = usymbol = None
 
         if uunit:
             uuri = str(uunit[0])
 
             # using pre-existing lv2 unit
-            if uuri.startswith(str(world.ns.units)):
+            if uuri.startswith(NS_UNITS):
                 uuri = uuri.rsplit('#', 1)[-1]
 
                 if uuri not in LV2_UNITS:
@@ -408,11 +528,11 @@ def _get_port_info(ctx, port):
 
             # using custom unit
             else:
-                xlabel = world.find_nodes(uunit[0], world.ns.rdfs.label, None)
+                xlabel = world.find_nodes(uunit[0], nodes.rdfs_label, None)
                 xrender = world.find_nodes(
-                    uunit[0], world.ns.units.render, None)
+                    uunit[0], nodes.units_render, None)
                 xsymbol = world.find_nodes(
-                    uunit[0], world.ns.units.symbol, None)
+                    uunit[0], nodes.units_symbol, None)
 
                 if xlabel:
                     ulabel = str(xlabel[0])
@@ -470,14 +590,14 @@ def _get_plugin_ports(ctx, plugin):
         }
     }
 
-    ctx.portsymbols = set()
-    ctx.portnames = set()
-
     for i in range(plugin.get_num_ports()):
         port = plugin.get_port_by_index(i)
         types, info = _get_port_info(ctx, port)
         info['index'] = i
 
+        if ctx.port_fields is not None:
+            info = {key: value for key, value in info.items() if key in ctx.port_fields}
+
         is_input = "Input" in types
         types.remove("Input" if is_input else "Output")
 
@@ -491,12 +611,13 @@ def _get_plugin_ports(ctx, plugin):
 
 def _get_plugin_presets(ctx, plugin):
     world = ctx.world
-    presets = plugin.get_related(world.ns.presets.Preset)
+    nodes = ctx.nodes
+    presets = plugin.get_related(nodes.presets_Preset)
     preset_list = []
 
     for preset in presets:
         world.load_resource(preset)
-        labels = world.find_nodes(preset, world.ns.rdfs.label, None)
+        labels = world.find_nodes(preset, nodes.rdfs_label, None)
 
         if labels:
             label = str(labels[0])
@@ -511,28 +632,29 @@ def _get_plugin_presets(ctx, plugin):
 
 def _get_plugin_properties(ctx, plugin_uri):
     world = ctx.world
+    nodes = ctx.nodes
 
     properties = {}
     readable = [(node, False)
-                for node in world.find_nodes(plugin_uri, world.ns.patch.readable, None)]
+                for node in world.find_nodes(plugin_uri, nodes.patch_readable, None)]
     writeable = [(node, True)
-                 for node in world.find_nodes(plugin_uri, world.ns.patch.writable, None)]
+                 for node in world.find_nodes(plugin_uri, nodes.patch_writable, None)]
 
     for prop_uri, is_writable in readable + writeable:
         prop_node = world.find_nodes(
-            prop_uri, world.ns.rdf.type, world.ns.lv2.Parameter)
+            prop_uri, nodes.rdf_type, nodes.lv2_Parameter)
 
         if not prop_node:
             ctx.errors.append(
                 "Could not find defintion of property '%s'." % prop_uri)
             continue
 
-        label = world.find_nodes(prop_uri, world.ns.rdfs.label, None)
+        label = world.find_nodes(prop_uri, nodes.rdfs_label, None)
 
         if label:
             label = str(label[0])
 
-        range_ = world.find_nodes(prop_uri, world.ns.rdfs.range, None)
+        range_ = world.find_nodes(prop_uri, nodes.rdfs_range, None)
 
         if range_:
             range_ = str(range_[0])
@@ -548,13 +670,152 @@ def _get_plugin_properties(ctx, plugin_uri):
     return properties
 
 
+def _get_plugin_bundles(plugin):
+    bundlepath = plugin.get_bundle_uri().get_path().rstrip(os.sep)
+    bundles = {dirname(node.get_path().rstrip(os.sep))
+               for node in plugin.get_data_uris()}
+    bundles.add(bundlepath)
+    return sorted(bundles)
+
+
+def _get_plugin_depends(info):
+    """Return real paths of all bundles the plugin info was extracted from."""
+    depends = {realpath(bundle) for bundle in info.get('bundles') or ()}
+
+    for preset in info.get('presets') or ():
+        bundle = uri_to_bundle(preset['uri'])
+
+        if bundle:
+            depends.add(bundle)
+
+    return depends
+
+
+def plugin_hash(info):
+    """Return hex digest of the canonical JSON form of a plugin info dict.
+
+    Keys starting with an underscore (e.g. '_timings') are ignored.
+
+    """
+    data = json.dumps({key: value for key, value in info.items() if not key.startswith('_')},
+                      sort_keys=True, separators=(',', ':'))
+    return blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def get_fingerprint(info, bundle_hashes=None, depends=None):
+    """Return fingerprint of plugin info dict for change detection.
+
+    The fingerprint is a dict with the 'hash' of the plugin info (see
+    'plugin_hash') and a dict of 'bundles', which maps the real path of each
+    bundle the info was extracted from to the hash of its Turtle files (see
+    'bundles.bundle_hash').
+
+    bundle_hashes is an optional dict used to look up and store bundle hashes,
+    so bundles shared by several plugins are only read once. depends is the
+    set of bundle paths, which defaults to the bundles listed in the info.
+
+    """
+    if bundle_hashes is None:
+        bundle_hashes = {}
+
+    if depends is None:
+        depends = _get_plugin_depends(info)
+
+    for bundle in depends:
+        if bundle not in bundle_hashes:
+            bundle_hashes[bundle] = bundle_hash(bundle)
+
+    return {
+        'hash': plugin_hash(info),
+        'bundles': {bundle: bundle_hashes[bundle] for bundle in sorted(depends)},
+    }
+
+
+def diff_fingerprints(old, new):
+    """Yield event dict for each plugin added, removed or updated between fingerprint sets.
+
+    old and new map plugin URIs to fingerprints as returned by
+    'get_fingerprint'. Events have the 'event' type, the plugin 'uri' and,
+    unless the plugin was removed, its new 'fingerprint'. For updated plugins,
+    'changed' lists whether the 'bundles' and/or the 'content' hash differ.
+
+    """
+    for uri in sorted(set(old) | set(new)):
+        if uri not in new:
+            yield {'event': 'removed', 'uri': uri}
+        elif uri not in old:
+            yield {'event': 'added', 'uri': uri, 'fingerprint': new[uri]}
+        else:
+            previous = old[uri] or {}
+            changed = []
+
+            if previous.get('bundles') != new[uri]['bundles']:
+                changed.append('bundles')
+
+            if previous.get('hash') != new[uri]['hash']:
+                changed.append('content')
+
+            if changed:
+                yield {'event': 'updated', 'uri': uri, 'changed': changed,
+                       'fingerprint': new[uri]}
+
+
+class _StageTimer:
+    """Record the wall time spent in each extraction stage of a plugin."""
+
+    def start(self):
+        self.timings = {}
+        self.started = self.last = perf_counter()
+
+    def __call__(self, stage):
+        now = perf_counter()
+        self.timings[stage] = now - self.last
+        self.last = now
+
+    def result(self):
+        self.timings['total'] = self.last - self.started
+        return self.timings
+
+
+def profile_report(infos, top=10):
+    """Return summary of the '_timings' of plugin info dicts extracted with profiling.
+
+    Lists the total time per stage and the 'top' slowest plugins with their
+    slowest stage.
+
+    """
+    stages = {}
+    plugins = []
+
+    for info in infos:
+        timings = info.get('_timings')
+
+        if not timings:
+            continue
+
+        for stage, secs in timings.items():
+            stages[stage] = stages.get(stage, 0.0) + secs
+
+        slowest = max((s for s in timings if s != 'total'), key=timings.get)
+        plugins.append({
+            'uri': info['uri'],
+            'total': timings['total'],
+            'slowest_stage': slowest,
+            'slowest_stage_time': timings[slowest],
+        })
+
+    plugins.sort(key=lambda p: p['total'], reverse=True)
+    return {'plugins': len(plugins), 'stages': stages, 'slowest': plugins[:top]}
+
+
 def _get_plugin_info(ctx, plugin):
     world = ctx.world
-    world.ns.mod = lilv.Namespace(world, NS_MOD)
-    world.ns.patch = lilv.Namespace(world, NS_PATCH)
-    world.ns.pprops = lilv.Namespace(world, NS_PORT_PROPERTIES)
-    world.ns.presets = lilv.Namespace(world, NS_PRESET)
-    world.ns.units = lilv.Namespace(world, NS_UNITS)
+    nodes = ctx.nodes
+    # no-op if not profiling
+    timer = ctx.timer
+
+    if timer:
+        timer.start()
 
     ctx.errors = errors = []
     ctx.warnings = warnings = []
@@ -564,28 +825,23 @@ def _get_plugin_info(ctx, plugin):
 
     if uri is None:
         errors.append("plugin uri is missing or invalid")
-    elif str(uri).startswith("file:"):
-        errors.append(
-            "plugin uri is local, and thus not suitable for redistribution")
 
     # load all resources in bundle
     world.load_resource(uri)
 
+    if timer:
+        timer('load_resource')
+
     # name
     name = plugin.get_name()
 
-    if name is None:
-        errors.append("plugin name is missing")
-
     # label
-    label = getfirst(plugin, world.ns.mod.label)
+    label = getfirst(plugin, nodes.mod_label)
 
     if label is None:
         warnings.append("plugin label is missing")
         if name is not None:
             label = str(name)[:16]
-    elif len(label) > 16:
-        warnings.append("plugin label has more than 16 characters")
 
     # author
     author_name = plugin.get_author_name()
@@ -595,34 +851,21 @@ def _get_plugin_info(ctx, plugin):
     # binary
     binary = plugin.get_library_uri()
 
-    if binary is None:
-        errors.append("plugin binary is missing")
-    else:
+    if binary is not None:
         binary = binary.get_path()
 
     # brand
-    brand = getfirst(plugin, world.ns.mod.brand)
-
-    if brand is None:
-        warnings.append("plugin brand is missing")
-    elif len(brand) > 16:
-        warnings.append("plugin brand has more than 11 characters")
+    brand = getfirst(plugin, nodes.mod_brand)
 
     # license
-    license = getfirst(plugin, world.ns.doap.license)
-
-    if license is None:
-        errors.append("plugin license is missing")
+    license = getfirst(plugin, nodes.doap_license)
 
     # comment
-    comment = getfirst(plugin, world.ns.rdfs.comment)
-
-    if comment is None:
-        errors.append("plugin comment is missing")
+    comment = getfirst(plugin, nodes.rdfs_comment)
 
     # version
-    microver = plugin.get_value(world.ns.lv2.microVersion)
-    minorver = plugin.get_value(world.ns.lv2.minorVersion)
+    microver = plugin.get_value(nodes.lv2_microVersion)
+    minorver = plugin.get_value(nodes.lv2_minorVersion)
 
     if not microver and not minorver:
         errors.append("plugin is missing version information")
@@ -653,37 +896,56 @@ def _get_plugin_info(ctx, plugin):
         # otherwise it's stable
         stability = "stable"
 
-    # category
-    categories = plugin.get_value(world.ns.rdf.type)
+    # category and classes (type names without the 'Plugin' suffix, as printed by lv2-grep)
+    categories = plugin.get_value(nodes.rdf_type)
     category = set()
+    classes = []
 
     if categories:
         for node in categories:
-            category.update(LV2_CATEGORIES.get(
-                str(node).split('#', 1)[-1], []))
+            fragment = _fragment(ctx, node)
+            category.update(LV2_CATEGORIES.get(fragment, []))
+
+            if len(fragment) > 6 and fragment.endswith('Plugin') and '#' in str(node):
+                classes.append(fragment[:-6])
 
     # bundles
-    bundle = plugin.get_bundle_uri()
-    bundlepath = bundle.get_path().rstrip(os.sep)
-    bundles = plugin.get_data_uris()
-
-    if bundles:
-        bundles = {dirname(node.get_path().rstrip(os.sep)) for node in bundles}
-        bundles.add(bundlepath)
-        bundles = list(bundles)
-    else:
-        bundles = [bundlepath]
+    bundles = _get_plugin_bundles(plugin)
+
+    if timer:
+        timer('metadata')
+
+    # ports, presets and properties are expensive to extract, skip if not wanted
+    fields = ctx.fields
 
     # ports
-    ports = _get_plugin_ports(ctx, plugin)
+    if fields is None or 'ports' in fields:
+        ports = _get_plugin_ports(ctx, plugin)
+
+        if timer:
+            timer('ports')
+    else:
+        ports = None
 
     # presets
-    presets = _get_plugin_presets(ctx, plugin)
+    if fields is None or 'presets' in fields:
+        presets = _get_plugin_presets(ctx, plugin)
+
+        if timer:
+            timer('presets')
+    else:
+        presets = None
 
     # properties
-    properties = _get_plugin_properties(ctx, uri)
+    if fields is None or 'properties' in fields:
+        properties = _get_plugin_properties(ctx, uri)
 
-    return {
+        if timer:
+            timer('properties')
+    else:
+        properties = None
+
+    info = {
         'uri': node2str(uri),
         'name': node2str(name),
         'binary': binary,
@@ -691,7 +953,8 @@ def _get_plugin_info(ctx, plugin):
         'label': label,
         'license': license,
         'comment': comment,
-        'category': list(category),
+        'category': sorted(category),
+        'classes': classes,
         'microVersion': micro_version,
         'minorVersion': minor_version,
         'version': version,
@@ -701,7 +964,7 @@ def _get_plugin_info(ctx, plugin):
             'email': node2str(author_email),
             'homepage': node2str(author_homepage),
         },
-        'bundles': sorted(bundles),
+        'bundles': bundles,
         # 'ui': ui,
         'ports': ports,
         'presets': presets,
@@ -710,44 +973,440 @@ def _get_plugin_info(ctx, plugin):
         'warnings': sorted(warnings),
     }
 
+    if ctx.fingerprint:
+        # also hash bundles of presets, if these were not extracted
+        depends = _get_plugin_depends(info)
+
+    if fields is not None:
+        info = {key: value for key, value in info.items() if key in fields}
 
-def get_plugins_info(uri=None):
-    class _context():
-        pass
+    if ctx.fingerprint:
+        info['_fingerprint'] = get_fingerprint(info, ctx.bundle_hashes, depends)
+
+    if timer:
+        info['_timings'] = timer.result()
+
+    return info
+
+
+class _Context:
+    pass
+
+
+def _create_context(plugin_fields=None, port_fields=None, uris=None, profile=False,
+                    fingerprint=False):
+    ctx = _Context()
+    ctx.fields = plugin_fields
+    ctx.port_fields = port_fields
+    ctx.timer = _StageTimer() if profile else None
+    ctx.fingerprint = fingerprint
+    ctx.bundle_hashes = {}
+
+    if uris:
+        # only load the bundles of these plugins, if possible
+        ctx.world = load_world(uris)
+    else:
+        ctx.world = lilv.World()
+        ctx.world.load_all()
 
-    ctx = _context()
-    ctx.world = lilv.World()
-    ctx.world.load_all()
+    ctx.nodes = _intern_nodes(ctx.world)
+    ctx.fragments = {}
+    return ctx
+
+
+# Context of a worker process, initialized by _init_worker
+_worker_ctx = None
+
+
+def _init_worker(plugin_fields, port_fields, profile, fingerprint):
+    global _worker_ctx
+    _worker_ctx = _create_context(plugin_fields, port_fields, profile=profile,
+                                  fingerprint=fingerprint)
+
+
+def _get_plugins_info_worker(uris):
+    ctx = _worker_ctx
     plugins = ctx.world.get_all_plugins()
+    return [_get_plugin_info(ctx, plugins[ctx.world.new_uri(uri)]) for uri in uris]
+
+
+def _iter_plugins_info(ctx, plugins, jobs=1):
+    """Yield info dicts for given lilv plugins in order.
+
+    With jobs > 1, the plugins are split into chunks, which are handled by a
+    pool of worker processes, each with its own lilv.World.
+
+    """
+    plugins = list(plugins)
+
+    if jobs <= 1 or len(plugins) < 2:
+        for plugin in plugins:
+            yield _get_plugin_info(ctx, plugin)
+        return
+
+    uris = [str(plugin.get_uri()) for plugin in plugins]
+    # several chunks per worker even out differences in plugin complexity
+    chunksize = max(1, len(uris) // (jobs * 4))
+    chunks = [uris[i:i + chunksize] for i in range(0, len(uris), chunksize)]
+
+    with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                             initargs=(ctx.fields, ctx.port_fields,
+                                       ctx.timer is not None, ctx.fingerprint)) as executor:
+        for infos in executor.map(_get_plugins_info_worker, chunks):
+            yield from infos
+
+
+def _iter_cached_plugins_info(ctx, plugins, cache, jobs=1):
+    # Bundles which provide data for the installed plugins. Changes to any other
+    # bundle, e.g. a new bundle with presets, may affect any plugin.
+    claimed = {}
+
+    for plugin in plugins:
+        claimed[str(plugin.get_uri())] = {realpath(bundle)
+                                          for bundle in _get_plugin_bundles(plugin)}
+
+    if cache.unclaimed(set().union(*claimed.values())):
+        cache.clear()
+
+    cached = []
+    missing = []
+
+    for plugin in plugins:
+        uri = str(plugin.get_uri())
+        info = cache.lookup(uri, claimed[uri])
+
+        if info is None:
+            missing.append(plugin)
+
+        cached.append(info)
+
+    extracted = _iter_plugins_info(ctx, missing, jobs)
+
+    for info in cached:
+        if info is None:
+            info = next(extracted)
+            cache.store(info['uri'], {k: v for k, v in info.items() if not k.startswith('_')},
+                        _get_plugin_depends(info))
+
+        yield info
+
+    cache.prune(claimed)
+
+    try:
+        cache.save()
+    except OSError as exc:
+        print("Could not write cache file '%s': %s" % (cache.filename, exc), file=sys.stderr)
+
+
+def _project_info(info, fields, bundle_hashes=None):
+    """Return complete plugin info reduced to fields, with fingerprint if bundle_hashes is given."""
+    projected = project_plugin_info(info, fields)
+
+    if bundle_hashes is None:
+        return projected
+
+    # do not modify the cached dict, and also hash bundles of omitted presets
+    return dict(projected, _fingerprint=get_fingerprint(projected, bundle_hashes,
+                                                        _get_plugin_depends(info)))
+
+
+def _extract_all(plugin_fields):
+    # The problems found depend on which fields are extracted, so extract
+    # everything if they are requested, like for the cache, which always holds
+    # complete info. The result then does not depend on the use of the cache.
+    return plugin_fields is not None and not plugin_fields.isdisjoint(('errors', 'warnings'))
 
-    if uri:
-        uri = ctx.world.new_uri(uri)
-        return _get_plugin_info(ctx, plugins[uri])
+
+def _get_cache(cache_file=None):
+    return BundleCache(cache_file or get_cache_file('lv2-plugin-info.json'),
+                       version=CACHE_VERSION)
+
+
+def iter_plugins_info(cache=False, cache_file=None, jobs=1, fields=None, profile=False,
+                      fingerprint=False):
+    """Yield info dicts for all installed plugins ordered by URI.
+
+    Each dict is yielded as soon as it is extracted. See 'get_plugins_info' for
+    a description of the parameters.
+
+    """
+    plugin_fields, port_fields = parse_fields(fields)
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    if cache:
+        cache = _get_cache(cache_file)
+
+        # the cache always holds complete plugin info
+        if cache.valid:
+            infos = cache.values()
+        else:
+            ctx = _create_context(profile=profile)
+            plugins = list(ctx.world.get_all_plugins())
+            infos = _iter_cached_plugins_info(ctx, plugins, cache, jobs)
+    elif _extract_all(plugin_fields):
+        ctx = _create_context(profile=profile)
+        infos = _iter_plugins_info(ctx, ctx.world.get_all_plugins(), jobs)
     else:
-        return [_get_plugin_info(ctx, p) for p in plugins]
+        ctx = _create_context(plugin_fields, port_fields, profile=profile,
+                              fingerprint=fingerprint)
+        yield from _iter_plugins_info(ctx, ctx.world.get_all_plugins(), jobs)
+        return
+
+    bundle_hashes = {} if fingerprint else None
+
+    for info in infos:
+        yield _project_info(info, fields, bundle_hashes)
+
+
+def get_plugins_info(uri=None, cache=False, cache_file=None, jobs=1, fields=None,
+                     profile=False, fingerprint=False):
+    """Return info dict for plugin with given URI or list of dicts for all plugins.
+
+    If cache is True, plugin info is read from and stored in a persistent cache
+    file, which defaults to 'lv2-plugin-info.json' in the user cache directory.
+    Only plugins from bundles which changed since the cache was last written
+    are extracted again. If no bundle changed, lilv is not used at all.
+
+    With jobs > 1, info for all plugins is extracted by that many worker
+    processes in parallel. If jobs is 0, the number of CPUs is used. The
+    result is the same as with a single process.
+
+    If fields is given, it must be a list of plugin info keys, optionally
+    including port keys in the form 'ports.<key>' (e.g. 'ports.symbol'), and
+    only these are extracted and returned. The 'uri' is always included. If
+    'errors' or 'warnings' are selected, all fields are extracted, so these list
+    the same problems whichever other fields are selected and whether the
+    cache is used or not.
+
+    'errors' and 'warnings' only list problems found while reading the RDF
+    data, e.g. values which had to be replaced. Checks which only need the
+    extracted info are done by the rules in lint.py.
+
+    If profile is True, the wall time spent in each extraction stage is added
+    to the info of each extracted (i.e. not cached) plugin as '_timings'.
+
+    If fingerprint is True, the fingerprint of each plugin info (see
+    'get_fingerprint') is added as '_fingerprint'. Its hash is computed over
+    the returned fields only.
+
+    """
+    if not uri:
+        return list(iter_plugins_info(cache, cache_file, jobs, fields, profile, fingerprint))
+
+    plugin_fields, port_fields = parse_fields(fields)
+
+    if cache:
+        info = _get_cache(cache_file).lookup(uri)
+
+        if info is not None:
+            return _project_info(info, fields, {} if fingerprint else None)
+
+    if _extract_all(plugin_fields):
+        ctx = _create_context(uris=[uri], profile=profile)
+        plugins = ctx.world.get_all_plugins()
+        info = _get_plugin_info(ctx, plugins[ctx.world.new_uri(uri)])
+        return _project_info(info, fields, {} if fingerprint else None)
+
+    ctx = _create_context(plugin_fields, port_fields, uris=[uri], profile=profile,
+                          fingerprint=fingerprint)
+    plugins = ctx.world.get_all_plugins()
+    return _get_plugin_info(ctx, plugins[ctx.world.new_uri(uri)])
 
 
 def main(args=None):
     import argparse
     import pprint
-    import json
 
     ap = argparse.ArgumentParser()
     ap.add_argument(
         '-d', '--debug',
         action="store_true",
         help="Print debugging information to standard error")
+    ap.add_argument(
+        '-b', '--binary',
+        metavar='FILE',
+        help="Write info for all plugins to a binary catalog file with random access "
+             "by URI (see catalog.py) instead of JSON to standard output")
+    ap.add_argument(
+        '-C', '--cache',
+        action="store_true",
+        help="Use persistent cache and only re-read changed bundles")
+    ap.add_argument(
+        '--cache-file',
+        metavar='PATH',
+        help="Cache file (default: $XDG_CACHE_HOME/calvo-cli-tools/lv2-plugin-info.json)")
+    ap.add_argument(
+        '--changed-since',
+        metavar='FILE',
+        help="Only output added, updated and removed plugins as NDJSON events, compared "
+             "to the fingerprints in a file written with --fingerprint")
+    ap.add_argument(
+        '-f', '--fields',
+        metavar='LIST',
+        help="Comma-separated list of fields to extract, port fields as 'ports.<field>' "
+             "(e.g. 'name,category,ports.symbol', default: all)")
+    ap.add_argument(
+        '-F', '--fingerprint',
+        action="store_true",
+        help="Add a hash of the info of each plugin and of the Turtle files of its "
+             "bundles as '_fingerprint'")
+    ap.add_argument(
+        '-j', '--jobs',
+        type=int,
+        metavar='N',
+        default=1,
+        help="Number of worker processes to use, 0 for one per CPU (default: %(default)s)")
+    ap.add_argument(
+        '-n', '--ndjson',
+        action="store_true",
+        help="Output one JSON object per plugin and line as soon as it is extracted")
     ap.add_argument(
         '-p', '--pretty-format',
         action="store_true",
         help="Pretty format JSON output")
+    ap.add_argument(
+        '-P', '--profile',
+        action="store_true",
+        help="Add the time spent in each extraction stage to each plugin as '_timings' "
+             "and print a report of the slowest plugins and stages to standard error")
+    ap.add_argument(
+        '-w', '--watch',
+        action="store_true",
+        help="Keep running and output added, updated and removed plugins as NDJSON "
+             "events when bundles change (implies --cache)")
+    ap.add_argument(
+        '--interval',
+        type=float,
+        metavar='SECONDS',
+        default=2.0,
+        help="Polling interval for --watch, if inotify is not available "
+             "(default: %(default)s)")
+    ap.add_argument(
+        '--socket',
+        metavar='PATH',
+        help="Send --watch events to clients connected to this Unix domain socket "
+             "instead of standard output")
     ap.add_argument(
         'plugin_uri',
         nargs='?',
         metavar='URI', help='Plugin URI')
 
     args = ap.parse_args(args)
-    plugin_data = get_plugins_info(args.plugin_uri)
+    fields = args.fields.split(',') if args.fields else None
+
+    try:
+        parse_fields(fields)
+    except ValueError as exc:
+        return "error: %s" % exc
+
+    if args.watch:
+        if __package__:
+            from .plugin_watch import watch_plugins_info
+        else:
+            # run as a script
+            from plugin_watch import watch_plugins_info
+
+        try:
+            watch_plugins_info(cache_file=args.cache_file, jobs=args.jobs, fields=fields,
+                               interval=args.interval, socket_path=args.socket)
+        except FileExistsError as exc:
+            return "error: %s" % exc
+        except KeyboardInterrupt:
+            pass
+
+        return
+
+    if args.changed_since:
+        if __package__:
+            from .lint import load_infos
+        else:
+            # run as a script
+            from lint import load_infos
+
+        if args.plugin_uri:
+            return "error: --changed-since can only be used for all plugins."
+
+        try:
+            old = {info['uri']: info.get('_fingerprint')
+                   for info in load_infos(args.changed_since)}
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            return "error: could not read fingerprints: %s" % exc
+
+        new = {info['uri']: info['_fingerprint']
+               for info in iter_plugins_info(cache=args.cache, cache_file=args.cache_file,
+                                             jobs=args.jobs, fields=fields, fingerprint=True)}
+
+        for event in diff_fingerprints(old, new):
+            print(json.dumps(event, sort_keys=True), flush=True)
+
+        return
+
+    if args.binary:
+        if __package__:
+            from .catalog import write_catalog
+        else:
+            # run as a script
+            from catalog import write_catalog
+
+        if args.plugin_uri:
+            return "error: --binary can only be used for all plugins."
+
+        write_catalog(args.binary, iter_plugins_info(cache=args.cache, cache_file=args.cache_file,
+                                                     jobs=args.jobs, fields=fields,
+                                                     fingerprint=args.fingerprint))
+        return
+
+    plugin_data = None
+
+    # the query daemon holds complete, up-to-date info of all plugins, but
+    # does not compute fingerprints
+    if not args.profile and not args.cache_file and not args.fingerprint:
+        try:
+            plugin_data = call('info', {'uri': args.plugin_uri, 'fields': fields})
+        except DaemonError as exc:
+            return "error: %s" % exc
+        except DaemonUnavailable:
+            pass
+
+    if args.ndjson:
+        if plugin_data is not None:
+            plugins = [plugin_data] if args.plugin_uri else plugin_data
+        elif args.plugin_uri:
+            plugins = [get_plugins_info(args.plugin_uri, cache=args.cache,
+                                        cache_file=args.cache_file, fields=fields,
+                                        profile=args.profile, fingerprint=args.fingerprint)]
+        else:
+            plugins = iter_plugins_info(cache=args.cache, cache_file=args.cache_file,
+                                        jobs=args.jobs, fields=fields, profile=args.profile,
+                                        fingerprint=args.fingerprint)
+
+        timings = []
+
+        for plugin_data in plugins:
+            if args.debug:
+                print(pprint.pformat(plugin_data), file=sys.stderr)
+
+            if args.profile and '_timings' in plugin_data:
+                timings.append({'uri': plugin_data['uri'], '_timings': plugin_data['_timings']})
+
+            print(json.dumps(plugin_data, sort_keys=True), flush=True)
+
+        if args.profile:
+            print(json.dumps(profile_report(timings), indent=4), file=sys.stderr)
+
+        return
+
+    if plugin_data is None:
+        plugin_data = get_plugins_info(args.plugin_uri, cache=args.cache,
+                                       cache_file=args.cache_file, jobs=args.jobs,
+                                       fields=fields, profile=args.profile,
+                                       fingerprint=args.fingerprint)
+
+    if args.profile:
+        report = profile_report(plugin_data if isinstance(plugin_data, list) else [plugin_data])
+        print(json.dumps(report, indent=4), file=sys.stderr)
 
     if args.debug:
         print(pprint.pformat(plugin_data), file=sys.stderr)
@@ -761,6 +1420,4 @@ def main(args=None):
 
 
 if __name__ == '__main__':
-    import sys
-
     sys.exit(main() or 0)
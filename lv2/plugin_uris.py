@@ -21,39 +21,175 @@
 # SOFTWARE.
 
 #!/usr/bin/env python
-"""List URIs associated with an LV2 plugin. TODO"""
-
-# import sys
-# import lilv
-
-
-# if len(sys.argv) < 2:
-#     sys.exit("Usage: %s <plugin URI>" % sys.argv[0])
-
-# w = lilv.World()
-# w.load_all()
-# plugins = w.get_all_plugins()
-# plugin = plugins[w.new_uri(sys.argv[1])]
-
-# print("Name: %s" % plugin.get_name())
-# print("Plugin URI: %s" % plugin.get_uri())
-# print("Bundle URI: %s" % plugin.get_bundle_uri())
-# print("Shared library URI: %s" % plugin.get_library_uri())
-
-# nodelist = plugin.get_data_uris()
-# uris = [str(n) for n in nodelist]
-# print("Data URIs:")
-# for uri in uris:
-#     print("-", uri)
-
-# nodelist = plugin.get_uis()
-# uris = [str(n) for n in nodelist]
-# print("UI URIs:")
-# for uri in uris:
-#     print("-", uri)
-
-# nodelist = plugin.get_related(None)
-# uris = [str(n) for n in nodelist]
-# print("Resource URIs:")
-# for uri in uris:
-#     print("-", uri)
+"""List URIs associated with LV2 plugins as JSON objects, one per line.
+
+For each plugin, the object holds the plugin URI and name, the URI of its
+bundle, the paths of all bundles with data about it, the URI of its shared
+library and the URIs of its data files, UIs and related resources, e.g.
+presets.
+
+The results are cached per bundle and only extracted again for plugins from
+bundles which were added, removed or modified.
+
+"""
+
+import argparse
+import json
+import sys
+
+if __package__:
+    from .bundles import BundleCache, get_cache_file
+    from .plugin_index import get_plugin_bundles, load_world
+    from .plugin_info import _get_plugin_bundles, node2str
+    from .query_client import DaemonError, DaemonUnavailable, call
+else:
+    # run as a script
+    from bundles import BundleCache, get_cache_file
+    from plugin_index import get_plugin_bundles, load_world
+    from plugin_info import _get_plugin_bundles, node2str
+    from query_client import DaemonError, DaemonUnavailable, call
+
+
+# Increment when the structure of the cache entries changes
+CACHE_VERSION = 1
+
+
+def get_plugin_uris(plugin):
+    """Return dict with the URIs associated with a lilv plugin."""
+    library = plugin.get_library_uri()
+    return {
+        'uri': str(plugin.get_uri()),
+        'name': node2str(plugin.get_name()),
+        'bundle': str(plugin.get_bundle_uri()),
+        'bundles': _get_plugin_bundles(plugin),
+        'library': str(library) if library is not None else None,
+        'data': sorted(str(node) for node in plugin.get_data_uris()),
+        'uis': sorted(str(ui.get_uri()) for ui in plugin.get_uis()),
+        'related': sorted(str(node) for node in plugin.get_related(None)),
+    }
+
+
+def iter_plugins_uris(world, uris=None):
+    """Yield URI dicts of the plugins in world with given URIs or of all plugins.
+
+    For URIs of plugins not in world, a dict with the 'uri' and an 'error'
+    message is yielded.
+
+    """
+    plugins = world.get_all_plugins()
+
+    if uris is None:
+        for plugin in plugins:
+            yield get_plugin_uris(plugin)
+
+        return
+
+    for uri in uris:
+        try:
+            yield get_plugin_uris(plugins[uri])
+        except (KeyError, ValueError):
+            yield {'uri': uri, 'error': "no plugin with URI '%s' found." % uri}
+
+
+def iter_cached_plugins_uris(uris=None, cache_file=None):
+    """Yield URI dicts like 'iter_plugins_uris' using a persistent cache.
+
+    If no bundle changed since the cache was written, no bundle is loaded.
+    Otherwise all bundles are loaded and only plugins from changed bundles are
+    extracted again.
+
+    """
+    cache = BundleCache(cache_file or get_cache_file('lv2-plugin-uris.json'),
+                        version=CACHE_VERSION)
+
+    if not cache.valid:
+        world = load_world()
+        claimed = {str(plugin.get_uri()): get_plugin_bundles(world, plugin)
+                   for plugin in world.get_all_plugins()}
+
+        if cache.unclaimed(set().union(*claimed.values())):
+            cache.clear()
+
+        # all plugins are extracted, so the cache holds them all when written
+        for plugin in world.get_all_plugins():
+            uri = str(plugin.get_uri())
+
+            if cache.lookup(uri, claimed[uri]) is None:
+                cache.store(uri, get_plugin_uris(plugin), claimed[uri])
+
+        cache.prune(claimed)
+
+        try:
+            cache.save()
+        except OSError as exc:
+            print("Could not write cache file '%s': %s" % (cache.filename, exc),
+                  file=sys.stderr)
+
+    if uris is None:
+        yield from cache.values()
+        return
+
+    for uri in uris:
+        data = cache.lookup(uri)
+        yield data if data is not None else {
+            'uri': uri, 'error': "no plugin with URI '%s' found." % uri}
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument(
+        '--cache-file',
+        metavar='PATH',
+        help="Cache file (default: $XDG_CACHE_HOME/calvo-cli-tools/lv2-plugin-uris.json)")
+    ap.add_argument(
+        '--no-cache',
+        action="store_true",
+        help="Do not use the persistent cache")
+    ap.add_argument(
+        'plugin_uri',
+        nargs='*',
+        metavar='URI',
+        help="Plugin URI ('-' reads URIs from standard input, one per line, "
+             "default: all plugins)")
+
+    args = ap.parse_args(args)
+    uris = []
+
+    for uri in args.plugin_uri:
+        if uri == '-':
+            uris.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            uris.append(uri)
+
+    uris = uris or None
+    results = None
+
+    # the daemon uses the default cache file
+    if not args.cache_file and not args.no_cache:
+        try:
+            results = call('uris', {'uris': uris})
+        except DaemonError as exc:
+            return "error: %s" % exc
+        except DaemonUnavailable:
+            pass
+
+    if results is None:
+        if args.no_cache:
+            results = iter_plugins_uris(load_world(uris), uris)
+        else:
+            results = iter_cached_plugins_uris(uris, args.cache_file)
+
+    missing = False
+
+    for data in results:
+        if 'error' in data:
+            print("error: %s" % data['error'], file=sys.stderr)
+            missing = True
+        else:
+            print(json.dumps(data, sort_keys=True), flush=True)
+
+    return 1 if missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+"""Watch the LV2 bundle directories and report changes to the installed plugins.
+
+Changes are detected with inotify, if the 'inotify_simple' package is
+installed, and by periodically comparing the bundle signatures otherwise.
+Only plugins from added, removed or modified bundles are extracted again,
+using the persistent plugin info cache.
+
+Each change is reported as a JSON object on a separate line:
+
+    {"event": "added", "uri": "...", "plugin": {...}}
+    {"event": "updated", "uri": "...", "plugin": {...}}
+    {"event": "removed", "uri": "..."}
+
+On start-up (and to each new socket client) the current plugins are reported
+as "added" events.
+
+"""
+
+import json
+import os
+import select
+import socket
+import stat
+import sys
+import time
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+if __package__:
+    from .bundles import find_bundles, get_lv2_path, scan_bundles
+    from .plugin_info import iter_plugins_info
+else:
+    # run as a script
+    from bundles import find_bundles, get_lv2_path, scan_bundles
+    from plugin_info import iter_plugins_info
+
+
+# seconds to wait for more file system events before re-scanning bundles
+DEBOUNCE = 0.5
+
+# pending output in bytes, after which a socket client is disconnected
+MAX_OUTPUT = 16 * 1024 * 1024
+
+
+class _BundleMonitor:
+    """Wait for changes in the LV2 search path directories and bundles."""
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+
+        if INotify is not None:
+            self.inotify = INotify()
+            self.mask = (flags.CREATE | flags.DELETE | flags.MODIFY | flags.ATTRIB |
+                         flags.MOVED_FROM | flags.MOVED_TO | flags.CLOSE_WRITE)
+            self.watch()
+        else:
+            self.inotify = None
+            self.signatures = scan_bundles()
+
+    def fileno(self):
+        return self.inotify.fileno() if self.inotify else None
+
+    def watch(self):
+        """Add watches for the search path directories and all current bundles."""
+        if self.inotify is None:
+            return
+
+        for path in get_lv2_path() + find_bundles():
+            try:
+                self.inotify.add_watch(path, self.mask)
+            except OSError:
+                # directory does not exist (anymore)
+                pass
+
+    def timeout(self):
+        """Return maximum time to wait in select() before calling 'changed'."""
+        return None if self.inotify else self.interval
+
+    def changed(self):
+        """Return True if bundles may have changed since the last call."""
+        if self.inotify is None:
+            signatures = scan_bundles()
+            changed = signatures != self.signatures
+            self.signatures = signatures
+            return changed
+
+        if not self.inotify.read(timeout=0):
+            return False
+
+        # wait until an installation or removal has finished
+        while self.inotify.read(timeout=int(DEBOUNCE * 1000)):
+            pass
+
+        return True
+
+
+def _format_event(event, uri, info=None):
+    data = {'event': event, 'uri': uri}
+
+    if info is not None:
+        data['plugin'] = info
+
+    return json.dumps(data, sort_keys=True) + '\n'
+
+
+def diff_catalogs(old, new):
+    """Yield (event, uri, info) tuples for the differences between two catalogs.
+
+    Catalogs are dicts mapping plugin URIs to plugin info dicts.
+
+    """
+    for uri in sorted(set(old) | set(new)):
+        if uri not in new:
+            yield 'removed', uri, None
+        elif uri not in old:
+            yield 'added', uri, new[uri]
+        elif old[uri] != new[uri]:
+            yield 'updated', uri, new[uri]
+
+
+class _StreamOutput:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def fileno(self):
+        return None
+
+    def pending(self):
+        return []
+
+    def flush(self, clients):
+        pass
+
+    def send(self, lines):
+        self.stream.writelines(lines)
+        self.stream.flush()
+
+
+class _SocketOutput:
+    """Unix domain socket server sending events to all connected clients.
+
+    The client sockets are non-blocking and the events are buffered until
+    they can be sent, so a client which does not read them does not stall the
+    others. It is disconnected when it still has more than MAX_OUTPUT bytes
+    pending on the next change.
+
+    Raises FileExistsError if path exists and is not a socket or another
+    process is listening on it.
+
+    """
+
+    def __init__(self, path):
+        if os.path.lexists(path):
+            if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                raise FileExistsError("'%s' exists and is not a socket." % path)
+
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+            try:
+                probe.connect(path)
+            except OSError:
+                # left over from a watcher which did not exit cleanly
+                os.unlink(path)
+            else:
+                raise FileExistsError("Socket '%s' is in use." % path)
+            finally:
+                probe.close()
+
+        self.path = path
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+        self.clients = {}
+
+    def fileno(self):
+        return self.server.fileno()
+
+    def pending(self):
+        """Return the client sockets with buffered output."""
+        return [client for client, output in self.clients.items() if output]
+
+    def accept(self, catalog):
+        client, _ = self.server.accept()
+        client.setblocking(False)
+        self.clients[client] = bytearray()
+        lines = [_format_event('added', uri, info) for uri, info in sorted(catalog.items())]
+        self._send(client, lines)
+
+    def _send(self, client, lines):
+        output = self.clients[client]
+
+        # the initial events for all plugins may be larger than the limit
+        if len(output) > MAX_OUTPUT:
+            # the client does not read what it is sent
+            self._close(client)
+            return
+
+        output += ''.join(lines).encode('utf-8')
+        self.flush([client])
+
+    def _close(self, client):
+        client.close()
+        del self.clients[client]
+
+    def send(self, lines):
+        for client in list(self.clients):
+            self._send(client, lines)
+
+    def flush(self, clients):
+        """Send as much of the buffered output to the given clients as possible."""
+        for client in clients:
+            output = self.clients.get(client)
+
+            if not output:
+                continue
+
+            try:
+                del output[:client.send(output)]
+            except BlockingIOError:
+                pass
+            except OSError:
+                self._close(client)
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+
+        self.server.close()
+        os.unlink(self.path)
+
+
+def watch_plugins_info(cache_file=None, jobs=1, fields=None, interval=2.0, socket_path=None):
+    """Report plugin changes on stdout or a Unix domain socket until interrupted."""
+
+    def get_catalog():
+        return {info['uri']: info
+                for info in iter_plugins_info(cache=True, cache_file=cache_file, jobs=jobs,
+                                              fields=fields)}
+
+    monitor = _BundleMonitor(interval)
+    catalog = get_catalog()
+
+    if socket_path:
+        output = _SocketOutput(socket_path)
+    else:
+        output = _StreamOutput(sys.stdout)
+        output.send([_format_event('added', uri, info) for uri, info in sorted(catalog.items())])
+
+    fds = [obj for obj in (monitor, output) if obj.fileno() is not None]
+
+    try:
+        while True:
+            if fds:
+                readable, writable, _ = select.select(fds, output.pending(), [],
+                                                      monitor.timeout())
+                output.flush(writable)
+            else:
+                time.sleep(monitor.timeout())
+                readable = []
+
+            if output in readable:
+                output.accept(catalog)
+
+            if (monitor in readable or monitor.fileno() is None) and monitor.changed():
+                monitor.watch()
+                new_catalog = get_catalog()
+                output.send([_format_event(*event) for event in diff_catalogs(catalog, new_catalog)])
+                catalog = new_catalog
+    finally:
+        if socket_path:
+            output.close()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""Send queries to a running LV2 query daemon (see query_daemon.py).
+
+Requests and responses are JSON-RPC 2.0 objects, each on a separate line,
+sent over a Unix domain socket. This module does not use lilv, so the command
+line scripts can answer queries via the daemon without loading any bundle.
+
+The socket path can be set with the LV2_QUERY_SOCKET environment variable.
+Setting it to an empty string disables the use of the daemon. The directory
+of the socket must be owned by the current user and not be accessible by
+anybody else, otherwise the daemon is not used.
+
+"""
+
+import json
+import os
+import socket
+import stat
+import tempfile
+from os.path import dirname, exists, join
+
+
+SOCKET_ENV = 'LV2_QUERY_SOCKET'
+
+
+class DaemonUnavailable(Exception):
+    """Raised when no query daemon is listening on the socket."""
+
+
+class DaemonError(Exception):
+    """Raised when the query daemon returns an error for a request."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def get_socket_path():
+    """Return path of the query daemon socket or None if its use is disabled."""
+    path = os.environ.get(SOCKET_ENV)
+
+    if path is not None:
+        return path or None
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+
+    if runtime_dir:
+        return join(runtime_dir, 'calvo-cli-tools', 'lv2-query.sock')
+
+    return join(tempfile.gettempdir(), 'calvo-cli-tools-%i' % os.getuid(), 'lv2-query.sock')
+
+
+def check_socket_dir(socket_path):
+    """Raise PermissionError unless the directory of socket_path is private.
+
+    It must be a directory (not a symbolic link) owned by the current user,
+    which only the user can access, so that no other user can put a socket
+    there, which would receive the requests.
+
+    """
+    directory = dirname(socket_path) or '.'
+    st = os.lstat(directory)
+
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError("Socket directory '%s' must be owned by the current user and "
+                              "have mode 0700." % directory)
+
+
+def call(method, params=None, socket_path=None):
+    """Send a request to the query daemon and return the result.
+
+    Raises DaemonUnavailable if the daemon is not running and DaemonError if
+    the request failed.
+
+    """
+    socket_path = socket_path or get_socket_path()
+
+    if not socket_path or not exists(socket_path):
+        raise DaemonUnavailable("No query daemon socket found.")
+
+    try:
+        check_socket_dir(socket_path)
+    except OSError as exc:
+        raise DaemonUnavailable("Not using query daemon: %s" % exc)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(socket_path)
+    except OSError as exc:
+        sock.close()
+        raise DaemonUnavailable("Could not connect to query daemon: %s" % exc)
+
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params or {}}
+
+    with sock, sock.makefile('rb') as fp:
+        try:
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            line = fp.readline()
+        except OSError as exc:
+            raise DaemonUnavailable("Query daemon connection failed: %s" % exc)
+
+    if not line:
+        raise DaemonUnavailable("Query daemon closed the connection.")
+
+    response = json.loads(line)
+
+    if 'error' in response:
+        raise DaemonError(response['error'].get('message'), response['error'].get('code'))
+
+    return response['result']
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+"""Answer LV2 plugin queries from memory over a Unix domain socket.
+
+The daemon loads all installed bundles into one lilv world on start-up and
+keeps the info of all plugins (see plugin_info.py) and the search index (see
+search.py) in memory. When bundles are added, removed or modified, the world
+and the plugin info of the changed bundles are loaded again.
+
+Clients send JSON-RPC 2.0 requests, one per line, and receive one response
+line per request (see query_client.py). Supported methods:
+
+* ping() - return process ID and number of plugins
+* reload() - reload all bundles
+* grep(pattern=None, ignore_case=False, categories=False, details=True) - see grep.py
+* search(query, match='substring', ignore_case=False) - see search.py
+* fuzzy(query, limit=10) - see search.py
+* info(uri=None, fields=None) - see plugin_info.py
+* presets(uris=None, contents=False) - see list_plugin_presets.py
+* uris(uris=None) - see plugin_uris.py
+
+The command line scripts use the daemon automatically if it is running.
+
+"""
+
+import argparse
+import inspect
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from os.path import dirname
+
+if __package__:
+    from .grep import grep
+    from .list_plugin_presets import get_contents_cache, iter_plugin_presets
+    from .plugin_info import (_create_context, _get_cache, _iter_cached_plugins_info,
+                              parse_fields, project_plugin_info)
+    from .plugin_uris import iter_plugins_uris
+    from .plugin_watch import _BundleMonitor
+    from .query_client import (DaemonError, DaemonUnavailable, call, check_socket_dir,
+                               get_socket_path)
+    from .search import SearchIndex, _make_record
+else:
+    # run as a script
+    from grep import grep
+    from list_plugin_presets import get_contents_cache, iter_plugin_presets
+    from plugin_info import (_create_context, _get_cache, _iter_cached_plugins_info,
+                             parse_fields, project_plugin_info)
+    from plugin_uris import iter_plugins_uris
+    from plugin_watch import _BundleMonitor
+    from query_client import (DaemonError, DaemonUnavailable, call, check_socket_dir,
+                              get_socket_path)
+    from search import SearchIndex, _make_record
+
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+QUERY_ERROR = -32000
+
+# pending output in bytes, after which a client is disconnected
+MAX_OUTPUT = 16 * 1024 * 1024
+
+
+class QueryDaemon:
+    """Loaded lilv world and plugin catalog with JSON-RPC request dispatch."""
+
+    def __init__(self, jobs=1):
+        self.jobs = jobs
+        self.methods = {
+            'fuzzy': self.fuzzy,
+            'grep': self.grep,
+            'info': self.info,
+            'ping': self.ping,
+            'presets': self.presets,
+            'reload': self.reload,
+            'search': self.search,
+            'uris': self.uris,
+        }
+        self.reload()
+
+    def reload(self):
+        """Load all bundles and update the plugin catalog and search index."""
+        ctx = _create_context()
+        cache = _get_cache()
+        plugins = list(ctx.world.get_all_plugins())
+
+        if cache.valid:
+            infos = cache.values()
+        else:
+            infos = _iter_cached_plugins_info(ctx, plugins, cache, self.jobs)
+
+        self.world = ctx.world
+        self.catalog = {info['uri']: info for info in infos}
+        self.index = SearchIndex(_make_record(info) for info in self.catalog.values())
+        self.loaded = set()
+        return len(self.catalog)
+
+    def ping(self):
+        return {'pid': os.getpid(), 'plugins': len(self.catalog)}
+
+    def grep(self, pattern=None, ignore_case=False, categories=False, details=True):
+        return grep(self.world, pattern, ignore_case, categories, details)
+
+    def search(self, query, match='substring', ignore_case=False):
+        return self.index.search(query, match, ignore_case)
+
+    def fuzzy(self, query, limit=10):
+        return self.index.fuzzy_search(query, limit)
+
+    def info(self, uri=None, fields=None):
+        parse_fields(fields)
+
+        if not uri:
+            return [project_plugin_info(self.catalog[key], fields)
+                    for key in sorted(self.catalog)]
+
+        try:
+            return project_plugin_info(self.catalog[uri], fields)
+        except KeyError:
+            raise ValueError("no plugin with URI '%s' found." % uri)
+
+    def presets(self, uris=None, contents=False):
+        cache = get_contents_cache() if contents else None
+        results = list(iter_plugin_presets(self.world, uris, contents, cache, self.loaded))
+
+        if cache is not None:
+            try:
+                cache.save()
+            except OSError as exc:
+                print("Could not write cache file '%s': %s" % (cache.filename, exc),
+                      file=sys.stderr)
+
+        return results
+
+    def uris(self, uris=None):
+        return list(iter_plugins_uris(self.world, uris))
+
+    def handle(self, line):
+        """Return JSON-RPC response line for request line or None for notifications."""
+        try:
+            request = json.loads(line)
+        except ValueError as exc:
+            return _error_response(None, PARSE_ERROR, "Parse error: %s" % exc)
+
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return _error_response(None, INVALID_REQUEST, "Invalid request")
+
+        req_id = request.get('id')
+        method = self.methods.get(request['method'])
+        params = request.get('params') or {}
+
+        if method is None:
+            response = _error_response(req_id, METHOD_NOT_FOUND,
+                                       "Method not found: %s" % request['method'])
+        else:
+            try:
+                if isinstance(params, dict):
+                    args = inspect.signature(method).bind(**params)
+                else:
+                    args = inspect.signature(method).bind(*params)
+            except TypeError as exc:
+                response = _error_response(req_id, INVALID_PARAMS, "Invalid params: %s" % exc)
+            else:
+                try:
+                    result = method(*args.args, **args.kwargs)
+                except Exception as exc:
+                    # a failing query must not bring down the daemon
+                    response = _error_response(req_id, QUERY_ERROR, str(exc))
+                else:
+                    response = json.dumps({'jsonrpc': '2.0', 'id': req_id, 'result': result})
+
+        if 'id' in request:
+            return response
+
+
+def _error_response(req_id, code, message):
+    return json.dumps({'jsonrpc': '2.0', 'id': req_id,
+                       'error': {'code': code, 'message': message}})
+
+
+def serve(daemon, socket_path, interval=2.0):
+    """Answer requests on a Unix domain socket and reload on bundle changes.
+
+    Runs until interrupted. The client sockets are non-blocking and the
+    responses are buffered until they can be sent, so a client which does not
+    read them does not stall the daemon. It is disconnected when it still has
+    more than MAX_OUTPUT bytes pending on its next response.
+
+    """
+    monitor = _BundleMonitor(interval)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+    clients = {}
+    last_poll = time.monotonic()
+
+    try:
+        while True:
+            fds = [server] + list(clients)
+
+            if monitor.fileno() is not None:
+                fds.append(monitor)
+
+            pending = [sock for sock, client in clients.items() if client.output]
+            readable, writable, _ = select.select(fds, pending, [], monitor.timeout())
+
+            # without inotify, only re-scan bundles once per polling interval
+            if monitor.fileno() is None:
+                poll = time.monotonic() - last_poll >= interval
+            else:
+                poll = monitor in readable
+
+            if poll:
+                last_poll = time.monotonic()
+
+                if monitor.changed():
+                    monitor.watch()
+                    daemon.reload()
+
+            for sock in writable:
+                if sock in clients:
+                    _flush(clients, sock)
+
+            for sock in readable:
+                if sock is server:
+                    client, _ = server.accept()
+                    client.setblocking(False)
+                    clients[client] = _Client()
+                elif sock in clients:
+                    _read_requests(daemon, clients, sock)
+    finally:
+        for client in clients:
+            client.close()
+
+        server.close()
+        os.unlink(socket_path)
+
+
+class _Client:
+    """Input and output buffers of a client connection."""
+
+    def __init__(self):
+        self.input = b''
+        self.output = bytearray()
+
+
+def _read_requests(daemon, clients, sock):
+    try:
+        data = sock.recv(65536)
+    except BlockingIOError:
+        return
+    except OSError:
+        data = b''
+
+    if not data:
+        _close(clients, sock)
+        return
+
+    *lines, clients[sock].input = (clients[sock].input + data).split(b'\n')
+
+    for line in lines:
+        if not line.strip():
+            continue
+
+        response = daemon.handle(line)
+
+        if response is not None:
+            _send(clients, sock, response.encode('utf-8') + b'\n')
+
+            if sock not in clients:
+                return
+
+
+def _send(clients, sock, data):
+    client = clients[sock]
+
+    # a single response may be larger than the limit, e.g. the info of all plugins
+    if len(client.output) > MAX_OUTPUT:
+        # the client does not read what it is sent
+        _close(clients, sock)
+        return
+
+    client.output += data
+    _flush(clients, sock)
+
+
+def _flush(clients, sock):
+    output = clients[sock].output
+
+    try:
+        del output[:sock.send(output)]
+    except BlockingIOError:
+        pass
+    except OSError:
+        _close(clients, sock)
+
+
+def _close(clients, sock):
+    sock.close()
+    del clients[sock]
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument(
+        '-j', '--jobs',
+        type=int,
+        metavar='N',
+        default=1,
+        help="Number of worker processes to extract plugin info, 0 for one per CPU "
+             "(default: %(default)s)")
+    ap.add_argument(
+        '--interval',
+        type=float,
+        metavar='SECONDS',
+        default=2.0,
+        help="Polling interval for bundle changes, if inotify is not available "
+             "(default: %(default)s)")
+    ap.add_argument(
+        '-s', '--socket',
+        metavar='PATH',
+        help="Unix domain socket path (default: $LV2_QUERY_SOCKET or "
+             "$XDG_RUNTIME_DIR/calvo-cli-tools/lv2-query.sock)")
+
+    args = ap.parse_args(args)
+    socket_path = args.socket or get_socket_path()
+
+    if not socket_path:
+        return "error: no socket path given."
+
+    if dirname(socket_path):
+        os.makedirs(dirname(socket_path), mode=0o700, exist_ok=True)
+
+    try:
+        # an existing directory may have been created by another user
+        check_socket_dir(socket_path)
+    except OSError as exc:
+        return "error: %s" % exc
+
+    try:
+        call('ping', socket_path=socket_path)
+    except (DaemonUnavailable, DaemonError):
+        pass
+    else:
+        return "error: query daemon is already running on '%s'." % socket_path
+
+    if os.path.exists(socket_path):
+        # left over from a daemon which was not shut down cleanly
+        os.unlink(socket_path)
+
+    daemon = QueryDaemon(os.cpu_count() or 1 if args.jobs == 0 else args.jobs)
+    # shut down cleanly and remove the socket on SIGTERM too
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+
+    try:
+        serve(daemon, socket_path, args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
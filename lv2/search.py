@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+"""Search installed LV2 plugins using a persistent index of plugin meta data.
+
+The index holds the URI, name, label, brand, author, categories, plugin classes
+and port counts of all installed plugins. It is stored in the user cache directory and
+only the plugins from bundles, which were added, removed or modified since it
+was last written, are read again with lilv. If no bundle changed, queries are
+answered from the index without loading any bundle.
+
+A query consists of whitespace-separated terms. Plain terms must match the
+URI, name, label, brand, author or one of the categories of a plugin. Terms of
+the form 'field:value' only match the given field, e.g.::
+
+    category:Reverb audio_in:2 brand:"Dragonfly"
+
+Port count fields ('audio_in', 'audio_out', 'control_in', 'control_out',
+'cv_in', 'cv_out', 'midi_in', 'midi_out') take a number, optionally prefixed
+with one of the comparison operators '<', '<=', '>' or '>='. All terms must
+match (logical AND).
+
+Fuzzy search ranks plugins by the similarity of their name or label to the
+query, using an index of the character trigrams of each word.
+
+"""
+
+import heapq
+import operator
+import re
+import shlex
+
+if __package__:
+    from .bundles import BundleCache, get_cache_file
+    from .plugin_info import _create_context, _iter_cached_plugins_info, parse_fields
+else:
+    # run as a script
+    from bundles import BundleCache, get_cache_file
+    from plugin_info import _create_context, _iter_cached_plugins_info, parse_fields
+
+
+# Increment when the structure of the index entries changes
+INDEX_VERSION = 2
+
+INDEX_FIELDS = ['author', 'brand', 'bundles', 'category', 'classes', 'label', 'name',
+                'ports.index', 'uri']
+TEXT_FIELDS = ('uri', 'name', 'label', 'brand', 'author')
+COUNT_FIELDS = ('audio_in', 'audio_out', 'control_in', 'control_out', 'cv_in', 'cv_out',
+                'midi_in', 'midi_out')
+MATCH_MODES = ('substring', 'prefix', 'regex')
+FUZZY_FIELDS = ('name', 'label')
+
+OPERATORS = (
+    ('<=', operator.le),
+    ('>=', operator.ge),
+    ('<', operator.lt),
+    ('>', operator.gt),
+    ('', operator.eq),
+)
+
+
+def _make_record(info):
+    ports = info.get('ports') or {}
+    record = {
+        'uri': info['uri'],
+        'name': info.get('name'),
+        'label': info.get('label'),
+        'brand': info.get('brand'),
+        'author': (info.get('author') or {}).get('name'),
+        'category': info.get('category') or [],
+        'classes': info.get('classes') or [],
+    }
+
+    for field in COUNT_FIELDS:
+        typ, direction = field.split('_')
+        record[field] = len(ports.get(typ, {}).get('input' if direction == 'in' else 'output', []))
+
+    return record
+
+
+def trigrams(text):
+    """Return set of the trigrams of the lower-cased words in text.
+
+    Words are padded with two spaces at the start and one at the end, so short
+    words and word beginnings get trigrams of their own.
+
+    """
+    grams = set()
+
+    for word in re.findall(r'\w+', text.lower()):
+        word = '  %s ' % word
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+
+    return grams
+
+
+def _iter_index_infos(index_file=None, jobs=1):
+    cache = BundleCache(index_file or get_cache_file('lv2-search-index.json'),
+                        version=INDEX_VERSION)
+
+    if cache.valid:
+        return cache.values()
+
+    ctx = _create_context(*parse_fields(INDEX_FIELDS))
+    return _iter_cached_plugins_info(ctx, list(ctx.world.get_all_plugins()), cache, jobs)
+
+
+class SearchIndex:
+    """In-memory search index of installed plugins."""
+
+    def __init__(self, records):
+        self.records = list(records)
+        self.by_category = {}
+        self._postings = None
+
+        for i, record in enumerate(self.records):
+            # text values and lower-cased variants for case-insensitive matching
+            text = {field: record[field] for field in TEXT_FIELDS if record[field]}
+            text['category'] = record['category']
+            record['_text'] = text
+            record['_lower'] = {field: value.lower() if isinstance(value, str)
+                                else [v.lower() for v in value]
+                                for field, value in text.items()}
+            # all values, one per line, to match plain terms in one go
+            record['_text']['all'] = '\n'.join(
+                [v for f, v in text.items() if f != 'category'] + record['category'])
+            record['_lower']['all'] = record['_text']['all'].lower()
+
+            for category in record['category']:
+                self.by_category.setdefault(category.lower(), set()).add(i)
+
+    @classmethod
+    def load(cls, index_file=None, jobs=1):
+        """Return index of installed plugins, updating the persistent index as needed."""
+        return cls(_make_record(info) for info in _iter_index_infos(index_file, jobs))
+
+    def search(self, query, match='substring', ignore_case=False):
+        """Return list of records of plugins matching query ordered by URI.
+
+        match selects how plain terms and text field values are compared:
+        'substring', 'prefix' (of the value or one of its words) or 'regex'.
+
+        Raises ValueError for invalid queries.
+
+        """
+        predicates = parse_query(query, match, ignore_case)
+        candidates = range(len(self.records))
+
+        # narrow down candidates with the category lookup table
+        for field, value, _ in predicates:
+            if field == 'category' and match != 'regex':
+                matching = self._categories_matching(value, match)
+                candidates = [i for i in candidates if i in matching]
+
+        results = []
+
+        for i in candidates:
+            record = self.records[i]
+
+            if all(pred(record) for _, _, pred in predicates):
+                results.append({k: v for k, v in record.items() if not k.startswith('_')})
+
+        return sorted(results, key=lambda r: r['uri'])
+
+    def _build_trigram_index(self):
+        # postings map trigrams to indexes into self._docs, which holds a
+        # (record index, number of trigrams) tuple for each fuzzy field value
+        self._postings = {}
+        self._docs = []
+
+        for i, record in enumerate(self.records):
+            for field in FUZZY_FIELDS:
+                grams = trigrams(record[field] or '')
+
+                if grams:
+                    for gram in grams:
+                        self._postings.setdefault(gram, []).append(len(self._docs))
+
+                    self._docs.append((i, len(grams)))
+
+    def fuzzy_search(self, query, limit=10, min_score=0.1):
+        """Return list of up to limit (score, record) tuples ranked by similarity.
+
+        The score of a plugin is the trigram similarity (shared trigrams
+        divided by the trigrams of both strings) of query and the plugin name or
+        label, whichever is higher, from 0.0 to 1.0. Plugins scoring below
+        min_score are left out.
+
+        """
+        if self._postings is None:
+            self._build_trigram_index()
+
+        query_grams = trigrams(query)
+
+        if not query_grams:
+            return []
+
+        shared = {}
+
+        for gram in query_grams:
+            for doc in self._postings.get(gram, ()):
+                shared[doc] = shared.get(doc, 0) + 1
+
+        nquery = len(query_grams)
+        scores = {}
+
+        for doc, count in shared.items():
+            i, ngrams = self._docs[doc]
+            score = count / (nquery + ngrams - count)
+
+            if score >= min_score and score > scores.get(i, 0.0):
+                scores[i] = score
+
+        records = self.records
+        best = heapq.nsmallest(limit, scores.items(),
+                               key=lambda item: (-item[1], records[item[0]]['uri']))
+        return [(score, {k: v for k, v in records[i].items() if not k.startswith('_')})
+                for i, score in best]
+
+    def _categories_matching(self, value, match):
+        matcher = _text_matcher(value, match, True)
+        return set().union(*(positions for category, positions in self.by_category.items()
+                             if matcher(category)))
+
+
+def _text_matcher(value, match, ignore_case):
+    """Return function matching a string against value.
+
+    With ignore_case, the function expects lower-cased strings, except for
+    regular expressions, which handle case themselves.
+
+    """
+    if match == 'regex':
+        # multi-line mode, so that '^' and '$' match each value of all values
+        rx = re.compile(value, re.M | (re.I if ignore_case else 0))
+        return lambda s: rx.search(s) is not None
+
+    if ignore_case:
+        value = value.lower()
+
+    if match == 'prefix':
+        # prefix of a value or of one of its words
+        rx = re.compile(r'(?:^|\s)' + re.escape(value), re.M)
+        return lambda s: rx.search(s) is not None
+
+    return lambda s: value in s
+
+
+def _text_predicate(field, matcher, lower):
+    key = '_lower' if lower else '_text'
+
+    if field is None:
+        def pred(record):
+            return matcher(record[key]['all'])
+    elif field == 'category':
+        def pred(record):
+            return any(matcher(v) for v in record[key]['category'])
+    else:
+        def pred(record):
+            value = record[key].get(field)
+            return value is not None and matcher(value)
+
+    return pred
+
+
+def _count_predicate(field, value):
+    for op_str, op in OPERATORS:
+        if value.startswith(op_str):
+            try:
+                number = int(value[len(op_str):])
+            except ValueError:
+                break
+
+            return lambda record: op(record[field], number)
+
+    raise ValueError("Invalid port count '%s' for field '%s'." % (value, field))
+
+
+def parse_query(query, match='substring', ignore_case=False):
+    """Return list of (field, value, predicate) tuples for the terms of query.
+
+    field is None for plain terms. Raises ValueError for invalid queries.
+
+    """
+    if match not in MATCH_MODES:
+        raise ValueError("Invalid match mode '%s'." % match)
+
+    try:
+        terms = shlex.split(query)
+    except ValueError as exc:
+        raise ValueError("Invalid query: %s" % exc)
+
+    predicates = []
+
+    for term in terms:
+        field, sep, value = term.partition(':')
+
+        # URIs contain colons too, only treat known field names as facets
+        if not sep or field not in TEXT_FIELDS + COUNT_FIELDS + ('category',):
+            field, value = None, term
+
+        try:
+            if field in COUNT_FIELDS:
+                pred = _count_predicate(field, value)
+            else:
+                matcher = _text_matcher(value, match, ignore_case)
+                pred = _text_predicate(field, matcher, ignore_case and match != 'regex')
+        except re.error as exc:
+            raise ValueError("Invalid regular expression '%s': %s" % (value, exc))
+
+        predicates.append((field, value, pred))
+
+    return predicates